@@ -1,6 +1,11 @@
 from docplex.mp.model import Model
 from time import time
 import csv
+from branching import apply_branching
+from checkpoint import Checkpoint
+from progress import solve_with_root_bound
+from solution_pool import solution_pool
+from tuning import apply_tuned_parameters
 # ### Miller Tucker Zemlin Constraints
 #
 # \begin{align}
@@ -14,13 +19,31 @@ import csv
 #     1 \leq u_i &\leq n+1, & i\in V \cup \{n+2\} \label{5h}\\
 #     x_i &= 1-y_{n+1,i}, & \forall i\in V \label{5i}
 # \end{align}
+# Tightened variant (tight=True): u is continuous, the labels are bounded by
+# the selection of the vertices and the parent arcs by the degrees
+# \begin{align}
+#     u_i &\geq 2-y_{n+1,i}, & \forall i\in V \label{5j}\\
+#     u_i &\leq n+1-n\,y_{n+1,i}, & \forall i\in V \label{5k}\\
+#     u_i &\leq n+1-(n-1)y_{n+2,i}, & \forall i\in V \label{5l}\\
+#     u_i &\leq 1+\displaystyle \sum_{k\in V} x_k, & \forall i\in V \label{5m}\\
+#     u_{n+2} &=1 \label{5n}\\
+#     \displaystyle \sum_{j:(i,j)\in E\cup E'} y_{ij} &\leq (\delta_i-1)x_i+y_{n+2,i}, & \forall i\in V \label{5o}
+# \end{align}
 class Miller_Tucker_Zemlin_Model:
-    def __init__(self, V,E,A, status=True):
+    def __init__(self, V,E,A, status=True, tight=False, timelimit=3600, mipgap=0.05,
+                 threads=0, output="results", checkpoint=None, template=False,
+                 branching=None):
         self.V = V
-        self.E = E
-        self.A = A
         self.status = status
-        self.model = Model("MTZ")
+        self.timelimit = timelimit
+        self.mipgap = mipgap
+        self.threads = threads
+        self.output = output
+        self.checkpoint = Checkpoint(checkpoint) if checkpoint else None
+        self.branching = branching
+        self.tight = tight
+        self.name = "MTZ_tight" if tight else "MTZ"
+        self.model = Model(self.name)
         self.v=len(V)
         self.U = V+[self.v+1]+[self.v+2]
         self.VV = V+[self.v+2]
@@ -29,30 +52,34 @@ class Miller_Tucker_Zemlin_Model:
             self.YY.append((self.v+1,i))
             self.YY.append((self.v+2,i))
         self.YY = self.YY+[(self.v+1,self.v+2)]
+        self.template = template
+        self._set_graph(E, A)
+        # Variables
+        self.x = self.model.binary_var_dict(V, name='x')
+        if template:
+            #Every arc, so that the model can be reused for any graph with n vertices
+            self.arcs = [(i,j) for i in V for j in V if i!=j]
+            self.y = self.model.binary_var_dict(self.arcs+self.YY, name='y')
+        else:
+            self.y = self.model.binary_var_dict(self.Y, name='y')
+        if tight:
+            self.u = self.model.continuous_var_dict(self.U, name='u')
+        else:
+            self.u = self.model.integer_var_dict(self.U, name='u')
+
+    def _set_graph(self, E, A):
+        self.E = E
+        self.A = A
         self.EE = []
         for i,j in E:
             self.EE.append((i,j))
             self.EE.append((j,i))
         self.Y = self.EE+self.YY
-        # Variables
-        self.x = self.model.binary_var_dict(V, name='x')
-        self.y = self.model.binary_var_dict(self.Y, name='y')
-        self.u = self.model.integer_var_dict(self.U, name='u')
 
     def _build_model(self):
         self.model.minimize(self.model.sum(self.x[i] for i in self.V))
-        self.model.add_constraints(self.model.sum(self.A[i-1][j-1]*self.x[j]
-                    for j in self.V)>=1 for i in self.V)
         #Constraint 1.12a
         self.model.add_constraint(self.model.sum(self.y[self.v+2,i] for i in self.V)==1)
-        #Constraint 1.12b
-        self.model.add_constraints(self.model.sum(self.y[i,j] for i in self.U if (i,j) in self.Y)
-                    ==1 for j in self.V)
-        #Constraint 1.12c
-        self.model.add_constraints(self.y[self.v+1,i]+self.y[i,j]<=1 for i,j in self.EE)
-        #Constraint 1.12d
-        self.model.add_constraints((self.v+1)*self.y[i,j]+self.u[i]-self.u[j]+(self.v-1)*self.y[j,i]
-                    <=self.v for i,j in self.EE)
         #Constraint 1.12e
         self.model.add_constraints((self.v+1)*self.y[i,j]+self.u[i]-self.u[j]<=self.v for i,j in self.YY)
         #Constraint 1.12f
@@ -64,15 +91,88 @@ class Miller_Tucker_Zemlin_Model:
         self.model.add_constraints(self.u[i]<=self.v+1 for i in self.VV)
         #Constraint 1.12i
         self.model.add_constraints(self.x[i]==1-self.y[self.v+1,i] for i in self.V)
+        if self.tight:
+            self._build_tight()
+        self._build_edges()
+
+    def _build_edges(self):
+        #Rows that depend on the edges, the only ones replaced by _patch
+        self.domination = self.model.add_constraints(self.model.sum(self.A[i-1][j-1]*self.x[j]
+                    for j in self.V)>=1 for i in self.V)
+        self.edge_cts = list(self.domination)
+        #Constraint 1.12b
+        Y = set(self.Y)
+        self.edge_cts += self.model.add_constraints(self.model.sum(self.y[i,j] for i in self.U if (i,j) in Y)
+                    ==1 for j in self.V)
+        #Constraint 1.12c
+        self.edge_cts += self.model.add_constraints(self.y[self.v+1,i]+self.y[i,j]<=1 for i,j in self.EE)
+        #Constraint 1.12d
+        self.edge_cts += self.model.add_constraints((self.v+1)*self.y[i,j]+self.u[i]-self.u[j]+(self.v-1)*self.y[j,i]
+                    <=self.v for i,j in self.EE)
+        if self.tight:
+            #Constraint 5o: a non-root vertex uses one of its edges for its parent
+            EE = set(self.EE)
+            degree = {i: sum(self.A[i-1][j-1] for j in self.V if j!=i) for i in self.V}
+            self.edge_cts += self.model.add_constraints(self.model.sum(self.y[i,j] for j in self.V if (i,j) in EE)
+                    <=(degree[i]-1)*self.x[i]+self.y[self.v+2,i] for i in self.V)
+        if self.template:
+            self._fix_non_edges()
 
+    def _fix_non_edges(self):
+        #The arcs of a template that are not edges are fixed to 0, updated only
+        #for the pairs whose status changed
+        EE = set(self.EE)
+        previous = getattr(self, 'fixed', set(self.arcs))
+        for i,j in previous^EE:
+            self.y[i,j].ub = 1 if (i,j) in EE else 0
+        self.fixed = EE
+
+    def _build_tight(self):
+        #Constraint 5j: vertices not hanging from n+1 are at least two levels deep
+        self.model.add_constraints(self.u[i]>=2-self.y[self.v+1,i] for i in self.V)
+        #Constraint 5k: unselected vertices keep label 1
+        self.model.add_constraints(self.u[i]<=self.v+1-self.v*self.y[self.v+1,i] for i in self.V)
+        #Constraint 5l: the root of the tree gets label 2
+        self.model.add_constraints(self.u[i]<=self.v+1-(self.v-1)*self.y[self.v+2,i] for i in self.V)
+        #Constraint 5m: no label deeper than the number of selected vertices
+        self.model.add_constraints(self.u[i]<=1+self.model.sum(self.x[k] for k in self.V) for i in self.V)
+        #Constraint 5n
+        self.model.add_constraint(self.u[self.v+2]==1)
+
+    def _patch(self, E, A):
+        #Swap the graph of a model built with template=True (see template.py)
+        self.model.remove_constraints(self.edge_cts)
+        self._set_graph(E, A)
+        self.priorities = None
+        self._build_edges()
+
+    def _set_edge(self, i, j, active):
+        #Switch the edge (i,j) on or off in the built model (N-1 contingencies)
+        for k,l in ((i,j),(j,i)):
+            self.domination[k-1].lhs.set_coefficient(self.x[l], 1 if active else 0)
+            self.y[k,l].ub = 1 if active else 0
+
+    def solve_pool(self, k=10, gap=None):
+        #k best distinct vertex sets, or all within gap vertices of the optimum
+        return solution_pool(self, k, gap)
+
+    def _set_parameters(self):
+        self.model.parameters.timelimit = self.timelimit
+        self.model.parameters.mip.tolerances.mipgap = self.mipgap
+        self.model.parameters.threads = self.threads
+        apply_tuned_parameters(self)
+        if self.branching:
+            apply_branching(self, self.branching)
 
     def solve_model(self):
-        print("MTZ")
-        self.model.parameters.timelimit = 3600
-        self.model.parameters.mip.tolerances.mipgap = 0.05
-        start = time()*1000
-        res = self.model.solve(clean_before_solve=True, log_output=self.status)
+        print(self.name)
+        self._set_parameters()
+        resumed = self.checkpoint.attach(self) if self.checkpoint is not None else 0
+        start = time()*1000-resumed*1000
+        res = solve_with_root_bound(self)
         end = time()*1000
+        if self.checkpoint is not None:
+            self.checkpoint.update(self, (end-start)/1000, finished=True)
         if res == None:
             print('infeasible')
             return
@@ -86,15 +186,20 @@ class Miller_Tucker_Zemlin_Model:
 
     def write_info(self, time, res):
         density = int(len(self.E)*2/(len(self.V)*len(self.V)-1)*100)
-        filename = "results/MTZ_"+str(len(self.V))+"_"+str(density)+".csv"
+        filename = self.output+"/"+self.name+"_"+str(len(self.V))+"_"+str(density)+".csv"
+        details = self.model.solve_details
+        variables = self.model.number_of_variables
+        if self.template:
+            #The arcs of the graph only, as in a model built for it
+            variables -= len(self.arcs)-len(self.EE)
         with open(filename, 'a') as csvfile:
             writer = csv.writer(csvfile)
-            writer.writerow(['MTZ', len(self.V), len(self.E), time, self.model.objective_value, self.model.number_of_variables, self.model.number_of_constraints ])
+            writer.writerow([self.name.replace('_',' '), len(self.V), len(self.E), time, self.model.objective_value, variables, self.model.number_of_constraints, self.root_bound, details.best_bound, details.nb_nodes_processed ])
         csvfile.close()
 
 
-def Miller_Tucker_Zemlin(V,E,A, status=True):
-    instance = Miller_Tucker_Zemlin_Model(V,E,A,status)
+def Miller_Tucker_Zemlin(V,E,A, status=True, tight=False, **kwargs):
+    instance = Miller_Tucker_Zemlin_Model(V,E,A,status,tight, **kwargs)
     instance._build_model()
     try:
         return instance.solve_model()
@@ -103,3 +208,7 @@ def Miller_Tucker_Zemlin(V,E,A, status=True):
         active_vertices = []
         active_edges = []
     return solution, active_vertices, active_edges
+
+
+def Miller_Tucker_Zemlin_tight(V,E,A, status=True, **kwargs):
+    return Miller_Tucker_Zemlin(V,E,A,status,tight=True, **kwargs)
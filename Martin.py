@@ -1,6 +1,10 @@
 from docplex.mp.model import Model
 from time import time
 import csv
+from branching import apply_branching
+from checkpoint import Checkpoint
+from solution_pool import solution_pool
+from tuning import apply_tuned_parameters
 
 # ## Martin Constraints
 # \begin{align}
@@ -25,17 +29,21 @@ import csv
 # In[73]:
 M = 1
 class Martin_Model:
-    def __init__(self, V,E,A, status=True):
+    def __init__(self, V,E,A, status=True, timelimit=3600, mipgap=0.05,
+                 threads=0, output="results", checkpoint=None, template=False,
+                 branching=None):
         self.V = V
-        self.E = E
         self.edges = [(i,j) for i in V for j in V]
-        self.EE = []
-        for i,j in E:
-            self.EE.append((i,j))
-            self.EE.append((j,i))
-        self.A = A
+        self._set_graph(E, A)
+        self.template = template
         self.Z = [(i,j,k) for i in V for j in V for k in V]
         self.status = status
+        self.timelimit = timelimit
+        self.mipgap = mipgap
+        self.threads = threads
+        self.output = output
+        self.checkpoint = Checkpoint(checkpoint) if checkpoint else None
+        self.branching = branching
         self.model = Model("Martin")
         self.x = self.model.binary_var_dict(V, name="x")
         self.y = self.model.binary_var_dict(self.edges, name="y")
@@ -44,20 +52,6 @@ class Martin_Model:
     def _build_model(self):
         #Objective function
         self.model.minimize(self.model.sum(self.x[i] for i in self.V))
-        self.model.add_constraints(self.model.sum(self.A[i-1][j-1]*self.x[j]
-                                for j in self.V)>=1 for i in self.V)
-        #Constraint 3a
-        self.model.add_constraint(self.model.sum(self.y[i,j] for i,j in self.E)
-                                == self.model.sum(self.x[i] for i in self.V)-1)
-        #Constraint 3b
-        self.model.add_constraints(self.y[i,j]<=self.x[i] for i,j in self.E)
-        self.model.add_constraints(self.y[i,j]<=self.x[j] for i,j in self.E)
-        #Constraint 3c
-        self.model.add_constraints(self.z[i,j,k]<=self.y[i,j] for i,j in self.E for k in self.V)
-        self.model.add_constraints(self.z[i,j,k]<=self.x[k] for i,j in self.E for k in self.V)
-        #Constraint 3d
-        self.model.add_constraints(self.z[j,i,k]<=self.y[i,j] for i,j in self.E for k in self.V)
-        self.model.add_constraints(self.z[j,i,k]<=self.x[k] for i,j in self.E for k in self.V)
         #Constraint 3e
         self.model.add_constraints(self.y[i,j]-M*(3-self.x[i]-self.x[j]-self.x[k])
                     <=self.z[i,j,k]+self.z[j,i,k] for i in self.V for j in self.V for k in self.V)
@@ -69,19 +63,89 @@ class Martin_Model:
                     for k in self.V if k!=i and k!=j)+self.y[i,j] for i in self.V for j in self.V )
         self.model.add_constraints(1+M*(2-self.x[i]-self.x[j])>=self.model.sum(self.z[i,k,j]
                     for k in self.V if k!=i and k!=j)+self.y[i,j] for i in self.V for j in self.V )
+        self._build_edges()
+
+    def _build_edges(self):
+        #Rows that depend on the edges, the only ones replaced by _patch
+        self.domination = self.model.add_constraints(self.model.sum(self.A[i-1][j-1]*self.x[j]
+                                for j in self.V)>=1 for i in self.V)
+        self.edge_cts = list(self.domination)
+        #Constraint 3a
+        self.edge_cts.append(self.model.add_constraint(self.model.sum(self.y[i,j] for i,j in self.E)
+                                == self.model.sum(self.x[i] for i in self.V)-1))
+        #Constraint 3b
+        self.edge_cts += self.model.add_constraints(self.y[i,j]<=self.x[i] for i,j in self.E)
+        self.edge_cts += self.model.add_constraints(self.y[i,j]<=self.x[j] for i,j in self.E)
+        #Constraint 3c
+        self.edge_cts += self.model.add_constraints(self.z[i,j,k]<=self.y[i,j] for i,j in self.E for k in self.V)
+        self.edge_cts += self.model.add_constraints(self.z[i,j,k]<=self.x[k] for i,j in self.E for k in self.V)
+        #Constraint 3d
+        self.edge_cts += self.model.add_constraints(self.z[j,i,k]<=self.y[i,j] for i,j in self.E for k in self.V)
+        self.edge_cts += self.model.add_constraints(self.z[j,i,k]<=self.x[k] for i,j in self.E for k in self.V)
         #Constraint 3g
-        self.model.add_constraints(self.y[i,j]==0 for i in self.V for j in self.V
-                                if (i,j) not in self.E and (j,i) not in self.E)
-        self.model.add_constraints(self.z[i,j,k]==0 for i in self.V for j in self.V
-                    for k in self.V if  (i,j) not in self.EE)
+        if self.template:
+            self._fix_non_edges()
+        else:
+            EE = set(self.EE)
+            self.edge_cts += self.model.add_constraints(self.y[i,j]==0 for i in self.V for j in self.V
+                                    if (i,j) not in EE)
+            self.edge_cts += self.model.add_constraints(self.z[i,j,k]==0 for i in self.V for j in self.V
+                        for k in self.V if (i,j) not in EE)
+
+    def _set_graph(self, E, A):
+        self.E = E
+        self.A = A
+        self.EE = []
+        for i,j in E:
+            self.EE.append((i,j))
+            self.EE.append((j,i))
+
+    def _fix_non_edges(self):
+        #The previous constraint as bounds, updated only for the pairs whose status changed
+        EE = set(self.EE)
+        previous = getattr(self, 'fixed', set(self.edges))
+        for i,j in previous^EE:
+            self.y[i,j].ub = 1 if (i,j) in EE else 0
+            for k in self.V:
+                self.z[i,j,k].ub = 1 if (i,j) in EE else 0
+        self.fixed = EE
+
+    def _patch(self, E, A):
+        #Swap the graph of a model built with template=True (see template.py)
+        self.model.remove_constraints(self.edge_cts)
+        self._set_graph(E, A)
+        self.priorities = None
+        self._build_edges()
+
+    def _set_edge(self, i, j, active):
+        #Switch the edge (i,j) on or off in the built model (N-1 contingencies)
+        for k,l in ((i,j),(j,i)):
+            self.domination[k-1].lhs.set_coefficient(self.x[l], 1 if active else 0)
+            self.y[k,l].ub = 1 if active else 0
+            for m in self.V:
+                self.z[k,l,m].ub = 1 if active else 0
+
+    def solve_pool(self, k=10, gap=None):
+        #k best distinct vertex sets, or all within gap vertices of the optimum
+        return solution_pool(self, k, gap)
+
+    def _set_parameters(self):
+        self.model.parameters.timelimit = self.timelimit
+        self.model.parameters.mip.tolerances.mipgap = self.mipgap
+        self.model.parameters.threads = self.threads
+        apply_tuned_parameters(self)
+        if self.branching:
+            apply_branching(self, self.branching)
 
     def solve_model(self):
         print("Martin")
-        self.model.parameters.timelimit = 3600
-        self.model.parameters.mip.tolerances.mipgap = 0.05
-        start = time()*1000
+        self._set_parameters()
+        resumed = self.checkpoint.attach(self) if self.checkpoint is not None else 0
+        start = time()*1000-resumed*1000
         res = self.model.solve(clean_before_solve=True, log_output=self.status)
         end = time()*1000
+        if self.checkpoint is not None:
+            self.checkpoint.update(self, (end-start)/1000, finished=True)
         elapsed = int(round(end-start))
         self.write_info(elapsed, res)
         active_vertices = [i for i in self.V if self.x[i].solution_value>0.9]
@@ -89,15 +153,16 @@ class Martin_Model:
         return res, active_vertices, active_edges
     def write_info(self, time, res):
         density = int(len(self.E)*2/(len(self.V)*len(self.V)-1)*100)
-        filename = "results/Martin_"+str(len(self.V))+"_"+str(density)+".csv"
+        filename = self.output+"/Martin_"+str(len(self.V))+"_"+str(density)+".csv"
+        details = self.model.solve_details
         with open(filename, 'a') as csvfile:
             writer = csv.writer(csvfile)
-            writer.writerow(['Martin', len(self.V), len(self.E), time, self.model.objective_value, self.model.number_of_variables, self.model.number_of_constraints ])
+            writer.writerow(['Martin', len(self.V), len(self.E), time, self.model.objective_value, self.model.number_of_variables, self.model.number_of_constraints, '', details.best_bound, details.nb_nodes_processed ])
         csvfile.close()
 
 
-def Martin(V,E,A, status=True):
-    instance = Martin_Model(V,E,A,status)
+def Martin(V,E,A, status=True, **kwargs):
+    instance = Martin_Model(V,E,A,status, **kwargs)
     instance._build_model()
     try:
         return instance.solve_model()
@@ -1,6 +1,11 @@
 from docplex.mp.model import Model
 from time import time
 import csv
+from branching import apply_branching
+from checkpoint import Checkpoint
+from progress import solve_with_root_bound
+from solution_pool import solution_pool
+from tuning import apply_tuned_parameters
 
 # ## Single Commodity Flow Constraints
 # \begin{align}
@@ -14,27 +19,46 @@ import csv
 #           \displaystyle \sum_{j\in V} x_j, & \forall i\in V \label{4f}\\
 #     r_i &\in \{0,1\}, & \forall i\in V \label{4g}
 # \end{align}
+# Tightened variant (tight=True): f is continuous and the flows are coupled to
+# the vertex selection and to the cardinality of the solution
+# \begin{align}
+#     f_{ij} &\leq (n-1)x_i,\ f_{ij}\leq (n-1)x_j, &\forall(i,j) \in E\cup E' \label{4h}\\
+#     f_{ij} &\leq \displaystyle \sum_{k\in V} x_k-1, &\forall(i,j) \in E\cup E' \label{4i}\\
+#     \displaystyle \sum_{j} f_{ji} &\geq x_i-r_i, &\forall i\in V \label{4j}
+# \end{align}
 
 class Single_Commodity_Flow_Model:
-    def __init__(self, V,E,A, status=True):
+    def __init__(self, V,E,A, status=True, tight=False, timelimit=3600, mipgap=0.05,
+                 threads=0, output="results", checkpoint=None, branching=None):
         self.V = V
         self.E = E
         self.A = A
         self.edges=[]
         self.status = status
+        self.timelimit = timelimit
+        self.mipgap = mipgap
+        self.threads = threads
+        self.output = output
+        self.checkpoint = Checkpoint(checkpoint) if checkpoint else None
+        self.branching = branching
+        self.tight = tight
+        self.name = "SCF_tight" if tight else "SCF"
         for i in range(len(A)):
             for j in range(len(A[i])):
                 if A[i][j]==1 and i!=j:
                     self.edges.append((i+1,j+1))
-        self.model = Model("SCF")
+        self.model = Model(self.name)
         self.x = self.model.binary_var_dict(V, name="x")
         self.r = self.model.binary_var_dict(V, name='r')
-        self.f = self.model.integer_var_dict(self.edges, name='f')
+        if tight:
+            self.f = self.model.continuous_var_dict(self.edges, name='f')
+        else:
+            self.f = self.model.integer_var_dict(self.edges, name='f')
 
     def _build_model(self):
         #Objective function
         self.model.minimize(self.model.sum(self.x[i] for i in self.V))
-        self.model.add_constraints(self.model.sum(self.A[i-1][j-1]*self.x[j]
+        self.domination = self.model.add_constraints(self.model.sum(self.A[i-1][j-1]*self.x[j]
                                 for j in self.V)>=1 for i in self.V)
         #Constraint 1.10a
         self.model.add_constraint(self.model.sum(self.r)==1)
@@ -63,14 +87,48 @@ class Single_Commodity_Flow_Model:
                     self.model.sum(self.f[j,i] for j in self.V if (j,i) in self.edges)-
                     self.model.sum(self.f[i,j] for j in self.V if (i,j) in self.edges)
                     ==self.x[i],0) for i in self.V)
+        if self.tight:
+            self._build_tight()
+
+    def _build_tight(self):
+        n = len(self.V)
+        #Constraint 4h
+        self.model.add_constraints(self.f[i,j]<=(n-1)*self.x[i] for i,j in self.edges)
+        self.model.add_constraints(self.f[i,j]<=(n-1)*self.x[j] for i,j in self.edges)
+        #Constraint 4i
+        self.model.add_constraints(self.f[i,j]<=self.model.sum(self.x[k] for k in self.V)-1
+                    for i,j in self.edges)
+        #Constraint 4j
+        self.model.add_constraints(self.model.sum(self.f[j,i] for j in self.V if (j,i) in self.edges)
+                    >=self.x[i]-self.r[i] for i in self.V)
+
+    def _set_edge(self, i, j, active):
+        #Switch the edge (i,j) on or off in the built model (N-1 contingencies)
+        for k,l in ((i,j),(j,i)):
+            self.domination[k-1].lhs.set_coefficient(self.x[l], 1 if active else 0)
+            self.f[k,l].ub = self.model.infinity if active else 0
+
+    def solve_pool(self, k=10, gap=None):
+        #k best distinct vertex sets, or all within gap vertices of the optimum
+        return solution_pool(self, k, gap)
+
+    def _set_parameters(self):
+        self.model.parameters.timelimit = self.timelimit
+        self.model.parameters.mip.tolerances.mipgap = self.mipgap
+        self.model.parameters.threads = self.threads
+        apply_tuned_parameters(self)
+        if self.branching:
+            apply_branching(self, self.branching)
 
     def solve_model(self):
-        print("SCF")
-        self.model.parameters.timelimit = 3600
-        self.model.parameters.mip.tolerances.mipgap = 0.05
-        start = time()*1000
-        res = self.model.solve(clean_before_solve=True, log_output=self.status)
+        print(self.name)
+        self._set_parameters()
+        resumed = self.checkpoint.attach(self) if self.checkpoint is not None else 0
+        start = time()*1000-resumed*1000
+        res = solve_with_root_bound(self)
         end = time()*1000
+        if self.checkpoint is not None:
+            self.checkpoint.update(self, (end-start)/1000, finished=True)
         #print(self.model.objective_value)
 
         elapsed = int(round(end-start))
@@ -81,14 +139,15 @@ class Single_Commodity_Flow_Model:
 
     def write_info(self, time, res):
         density = int(len(self.E)*2/(len(self.V)*len(self.V)-1)*100)
-        filename = "results/SCF_"+str(len(self.V))+"_"+str(density)+".csv"
+        filename = self.output+"/"+self.name+"_"+str(len(self.V))+"_"+str(density)+".csv"
+        details = self.model.solve_details
         with open(filename, 'a') as csvfile:
             writer = csv.writer(csvfile)
-            writer.writerow(['SCF', len(self.V), len(self.E), time, self.model.objective_value, self.model.number_of_variables, self.model.number_of_constraints ])
+            writer.writerow([self.name.replace('_',' '), len(self.V), len(self.E), time, self.model.objective_value, self.model.number_of_variables, self.model.number_of_constraints, self.root_bound, details.best_bound, details.nb_nodes_processed ])
         csvfile.close()
 
-def Single_Commodity_Flow(V,E,A, status=True):
-    instance = Single_Commodity_Flow_Model(V,E,A,status)
+def Single_Commodity_Flow(V,E,A, status=True, tight=False, **kwargs):
+    instance = Single_Commodity_Flow_Model(V,E,A,status,tight, **kwargs)
     instance._build_model()
     try:
         return instance.solve_model()
@@ -97,3 +156,7 @@ def Single_Commodity_Flow(V,E,A, status=True):
         active_vertices = []
         active_edges = []
     return solution, active_vertices, active_edges
+
+
+def Single_Commodity_Flow_tight(V,E,A, status=True, **kwargs):
+    return Single_Commodity_Flow(V,E,A,status,tight=True, **kwargs)
@@ -0,0 +1,180 @@
+from cplex.callbacks import LazyConstraintCallback
+
+from docplex.mp.callbacks.cb_mixin import *
+from docplex.mp.model import Model
+from collections import deque
+from time import time
+import csv
+from branching import apply_branching
+from checkpoint import Checkpoint
+from graphs import neighbourhood, spanning_edges
+from solution_pool import solution_pool
+from tuning import apply_tuned_parameters
+
+# ## Benders decomposition of the Single Commodity Flow model
+# The master keeps the vertex and root variables of SCF (constraints 4a, 4b and
+# the domination rows). For a candidate (x, r) the flow subproblem 4c-4f is a
+# max-flow from the root to every selected vertex through selected vertices
+# only. When it cannot deliver one unit to every selected vertex, a selected
+# vertex k is separated from the root by the neighbourhood N(K) of a set K of
+# vertices, which holds no selected vertex. The feasibility cut is
+# \begin{align}
+#     \displaystyle \sum_{v\in N(K)} x_v \geq x_k + \displaystyle \sum_{i\in R} r_i - 1 \label{4k}
+# \end{align}
+# with R the vertices on the other side of N(K). It is added for K every
+# unreached component (k\in K, R=V\backslash(K\cup N(K))) and for K the root
+# component (R=K, k unreached).
+
+def max_flow(nbrs, selected, root):
+    #Arcs between selected vertices are uncapacitated and every selected vertex
+    #has a sink arc of capacity 1, so the augmenting paths are the paths of a BFS
+    #tree: the flow is the number of vertices reached, the cut is their set
+    reached = {root}
+    queue = deque([root])
+    while queue:
+        u = queue.popleft()
+        for v in nbrs[u]:
+            if v in selected and v not in reached:
+                reached.add(v)
+                queue.append(v)
+    return len(reached)-1, reached
+
+
+def feasibility_cuts(nbrs, selected, root):
+    #Returns [] if the flow is feasible, else the cuts 4k as (k, R, N(K))
+    flow, reached = max_flow(nbrs, selected, root)
+    if flow == len(selected)-1:
+        return []
+    cuts = []
+    separator = set().union(*(nbrs[i] for i in reached))-reached
+    unreached = selected-reached
+    while unreached:
+        k = max(unreached, key=lambda i: len(nbrs[i]))
+        _, component = max_flow(nbrs, unreached, k)
+        unreached -= component
+        boundary = set().union(*(nbrs[i] for i in component))-component
+        cuts.append((k, sorted(set(nbrs)-component-boundary), sorted(boundary)))
+        cuts.append((k, sorted(reached), sorted(separator)))
+    return cuts
+
+
+class DOBendersCallback(ConstraintCallbackMixin, LazyConstraintCallback):
+    def __init__(self, env):
+        LazyConstraintCallback.__init__(self, env)
+        ConstraintCallbackMixin.__init__(self)
+        self.nb_lazy_cts = 0
+
+    def __call__(self):
+        sol_x = self.make_solution_from_vars(self.x.values())
+        sol_r = self.make_solution_from_vars(self.r.values())
+        selected = {i for i in self.V if sol_x['x_'+str(i)]>0.9}
+        root = max(self.V, key=lambda i: sol_r['r_'+str(i)])
+        cuts = feasibility_cuts(self.nbrs, selected, root)
+        for cut in cuts:
+            self.cuts.append(list(cut))
+            cpx_lhs, cpx_sense, cpx_rhs = self.linear_ct_to_cplex(self.cut_ct(*cut))
+            self.add(cpx_lhs, cpx_sense, cpx_rhs)
+        self.nb_lazy_cts += len(cuts)
+
+
+class Single_Commodity_Flow_Benders_Model:
+    def __init__(self, V,E,A, status=True, timelimit=3600, mipgap=0.05,
+                 threads=0, output="results", checkpoint=None, branching=None):
+        self.V = V
+        self.E = E
+        self.A = A
+        self.nbrs = neighbourhood(V,E)
+        self.status = status
+        self.timelimit = timelimit
+        self.mipgap = mipgap
+        self.threads = threads
+        self.output = output
+        self.checkpoint = Checkpoint(checkpoint) if checkpoint else None
+        self.branching = branching
+        self.cuts = []
+        self.model = Model("SCF_benders")
+        self.x = self.model.binary_var_dict(V, name="x")
+        self.r = self.model.binary_var_dict(V, name='r')
+
+    def _build_model(self):
+        #Objective function
+        self.model.minimize(self.model.sum(self.x[i] for i in self.V))
+        self.domination = self.model.add_constraints(self.model.sum(self.A[i-1][j-1]*self.x[j]
+                                for j in self.V)>=1 for i in self.V)
+        #Constraint 1.10a
+        self.model.add_constraint(self.model.sum(self.r)==1)
+        #Constraint 1.10b
+        self.model.add_constraints(self.r[i]<=self.x[i] for i in self.V)
+
+        #Lazy constraints for the flow subproblem
+        benders_cb = self.model.register_callback(DOBendersCallback)
+        benders_cb.x = self.x
+        benders_cb.r = self.r
+        benders_cb.V = self.V
+        benders_cb.nbrs = self.nbrs
+        benders_cb.cuts = self.cuts
+        benders_cb.cut_ct = self._cut_ct
+        self.benders_cb = benders_cb
+
+    def _cut_ct(self, k, roots, separator):
+        return (self.model.sum(self.x[v] for v in separator)>=
+                self.x[k]+self.model.sum(self.r[i] for i in roots)-1)
+
+    def _add_cuts(self, cuts):
+        #Feasibility cuts found by the callback in an earlier run, added as plain constraints
+        self.model.add_constraints(self._cut_ct(*cut) for cut in cuts)
+
+    def _set_edge(self, i, j, active):
+        #Switch the edge (i,j) on or off in the built model (N-1 contingencies)
+        for k,l in ((i,j),(j,i)):
+            self.domination[k-1].lhs.set_coefficient(self.x[l], 1 if active else 0)
+            if active:
+                self.nbrs[k].add(l)
+            else:
+                self.nbrs[k].discard(l)
+
+    def solve_pool(self, k=10, gap=None):
+        #k best distinct vertex sets, or all within gap vertices of the optimum
+        return solution_pool(self, k, gap)
+
+    def _set_parameters(self):
+        self.model.parameters.timelimit = self.timelimit
+        self.model.parameters.mip.tolerances.mipgap = self.mipgap
+        self.model.parameters.threads = self.threads
+        apply_tuned_parameters(self)
+        if self.branching:
+            apply_branching(self, self.branching)
+
+    def solve_model(self):
+        print("SCF benders")
+        self._set_parameters()
+        resumed = self.checkpoint.attach(self) if self.checkpoint is not None else 0
+        start = time()*1000-resumed*1000
+        res = self.model.solve(clean_before_solve=True, log_output=self.status)
+        end = time()*1000
+        if self.checkpoint is not None:
+            self.checkpoint.update(self, (end-start)/1000, finished=True)
+        if res == None:
+            return
+        elapsed = int(round(end-start))
+        self.write_info(elapsed, res)
+        active_vertices = [i for i in self.V if self.x[i].solution_value>0.9]
+        edges = set(self.E)
+        active_edges = [(i,j) if (i,j) in edges else (j,i)
+                        for i,j in spanning_edges(set(active_vertices), self.nbrs)]
+        return res, active_vertices, active_edges
+
+    def write_info(self, time, res):
+        density = int(len(self.E)*2/(len(self.V)*len(self.V)-1)*100)
+        filename = self.output+"/SCF_benders_"+str(len(self.V))+"_"+str(density)+".csv"
+        details = self.model.solve_details
+        with open(filename, 'a') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['SCF benders', len(self.V), len(self.E), time, self.model.objective_value, self.model.number_of_variables, self.model.number_of_constraints, '', details.best_bound, details.nb_nodes_processed ])
+        csvfile.close()
+
+
+def Single_Commodity_Flow_Benders(V,E,A, status=True, **kwargs):
+    instance = Single_Commodity_Flow_Benders_Model(V,E,A,status, **kwargs)
+    instance._build_model()
+    return instance.solve_model()
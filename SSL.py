@@ -2,6 +2,9 @@ from docplex.mp.model import Model
 import numpy as np
 from time import time
 import csv
+from branching import apply_branching
+from checkpoint import Checkpoint
+from tuning import apply_tuned_parameters
 # ## Simonetti - Salles Da Cunha - Lucena Constraints model
 # \begin{equation}
 # \min \sum_{i \in V} x_i
@@ -19,11 +22,21 @@ import csv
 
 
 class Simonetti_SallesDaCunha_Lucena_Model:
-    def __init__(self, V,E,A, status=True):
+    def __init__(self, V,E,A, status=True, timelimit=3600, mipgap=0.05,
+                 threads=0, output="results", checkpoint=None, branching=None):
         self.V = V
         self.E = E
         self.A = A
         self.status = status
+        self.timelimit = timelimit
+        self.mipgap = mipgap
+        self.threads = threads
+        self.output = output
+        self.checkpoint = Checkpoint(checkpoint) if checkpoint else None
+        self.branching = branching
+        self.cuts = []
+        #Set by a progress listener that aborts the solve (service.py)
+        self.stopped = False
         self.model = Model("SSL")
         self.x = self.model.binary_var_dict(V, name='x')
         self.y = self.model.integer_var_dict(E, name='y')
@@ -66,50 +79,57 @@ class Simonetti_SallesDaCunha_Lucena_Model:
                     graph[i].append(k)
                 elif i==k:
                     graph[i].append(j)
-        connected = np.zeros(len(self.active_vertices))
-        i = self.active_vertices[0]
-        connected[0] = 1
-        for j in range(1,len(self.active_vertices)):
-            #If exist a path from i to j
-            if exist_path(graph, i, self.active_vertices[j]):
-                connected[j] = 1
+        cycles = separate(graph, self.active_vertices)
         #if connected, return True, optimal solution found
-        if connected.all():
+        if cycles is None:
             return True
-        cycles = []
-        for node in self.active_vertices:
-            cyclenodes = [[node]+path for path in dfs(graph, node, node)]
-            for cycle in cyclenodes:
-                if len(cycle)>0:
-                    if (cycle not in cycles and cycle.reverse() not in cycles):
-                        cycles.append(cycle)
-            del graph[node]
-            for key in graph:
-                if node in graph[key]:
-                    graph[key].remove(node)
         #else: add constraints to the model and return false
         if len(cycles)>0:
-            for cycle in cycles:
-                self.model.add_constraints(self.model.sum(self.y[i,k] for (i,k) in self.E
-                if i in cycle and k in cycle)<=self.model.sum(self.x[i] for i in cycle if i!=j)
-                for j in cycle)
+            self.cuts.extend(cycles)
+            self._add_cuts(cycles)
 
         return False
 
+    def _add_cuts(self, cycles):
+        for cycle in cycles:
+            self.model.add_constraints(self.model.sum(self.y[i,k] for (i,k) in self.E
+            if i in cycle and k in cycle)<=self.model.sum(self.x[i] for i in cycle if i!=j)
+            for j in cycle)
+
+    def _set_parameters(self):
+        self.model.parameters.timelimit = self.timelimit
+        self.model.parameters.mip.tolerances.mipgap = self.mipgap
+        self.model.parameters.threads = self.threads
+        apply_tuned_parameters(self)
+        if self.branching:
+            apply_branching(self, self.branching)
+
     def solve_model(self):
         print("SSL")
         found_optimal = False
         self.iteration = 0
-        start = time()*1000
+        self.nodes = 0
+        resumed = 0
+        if self.checkpoint is not None:
+            resumed = self.checkpoint.attach(self)
+            self.iteration = self.checkpoint.state['iteration']
+        start = time()*1000-resumed*1000
         while not found_optimal:
             self.iteration+=1
             print("Iteration",self.iteration)
-            self.model.parameters.timelimit = 3600 #No more than an hour
-            self.model.parameters.mip.tolerances.mipgap = 0.05
+            self._set_parameters()
+            if self.checkpoint is not None:
+                self.model.parameters.timelimit = max(1, self.timelimit-(time()*1000-start)/1000)
             res = self.model.solve(clean_before_solve=True, log_output=self.status)
+            self.nodes += self.model.solve_details.nb_nodes_processed
+            if res is None and self.stopped:
+                #Aborted before the first incumbent: nothing to separate or report
+                return None
 
             found_optimal=self._update_constraints()
-            if self.iteration>200 or time()*1000-start>3600000:
+            if self.checkpoint is not None:
+                self.checkpoint.update(self, (time()*1000-start)/1000, self.iteration, found_optimal)
+            if self.iteration>200 or time()*1000-start>self.timelimit*1000 or self.stopped:
                 break
         end =  time()*1000
         elapsed = int(round(end-start))
@@ -119,13 +139,40 @@ class Simonetti_SallesDaCunha_Lucena_Model:
 
     def write_info(self, time, res):
         density = int(len(self.E)*2/(len(self.V)*len(self.V)-1)*100)
-        filename = "results/SSL_"+str(len(self.V))+"_"+str(density)+".csv"
+        filename = self.output+"/SSL_"+str(len(self.V))+"_"+str(density)+".csv"
+        #Bound of the last iteration, nodes of all of them
+        details = self.model.solve_details
         with open(filename, 'a') as csvfile:
             writer = csv.writer(csvfile)
-            writer.writerow(['SSL', len(self.V), len(self.E), time, self.model.objective_value, self.model.number_of_variables, self.model.number_of_constraints ])
+            writer.writerow(['SSL', len(self.V), len(self.E), time, self.model.objective_value, self.model.number_of_variables, self.model.number_of_constraints, '', details.best_bound, self.nodes ])
         csvfile.close()
 
 
+def separate(graph, active_vertices):
+    #Return None if the support graph is connected, else its cycles (graph is consumed)
+    connected = np.zeros(len(active_vertices))
+    i = active_vertices[0]
+    connected[0] = 1
+    for j in range(1,len(active_vertices)):
+        #If exist a path from i to j
+        if exist_path(graph, i, active_vertices[j]):
+            connected[j] = 1
+    if connected.all():
+        return None
+    cycles = []
+    for node in active_vertices:
+        cyclenodes = [[node]+path for path in dfs(graph, node, node)]
+        for cycle in cyclenodes:
+            if len(cycle)>0:
+                if (cycle not in cycles and cycle.reverse() not in cycles):
+                    cycles.append(cycle)
+        del graph[node]
+        for key in graph:
+            if node in graph[key]:
+                graph[key].remove(node)
+    return cycles
+
+
 def exist_path(graph, start, end):
     fringe = [(start, [])]
     while fringe:
@@ -152,8 +199,8 @@ def dfs(graph, start, end):
             fringe.append((next_state, path+[next_state]))
 
 
-def Simonetti_SallesDaCunha_Lucena(V,E,A, status=True):
-    instance = Simonetti_SallesDaCunha_Lucena_Model(V,E,A,status)
+def Simonetti_SallesDaCunha_Lucena(V,E,A, status=True, **kwargs):
+    instance = Simonetti_SallesDaCunha_Lucena_Model(V,E,A,status, **kwargs)
     instance._build_model()
     return instance.solve_model()
 
@@ -5,6 +5,10 @@ from docplex.mp.model import Model
 import numpy as np
 from time import time
 import csv
+from branching import apply_branching
+from checkpoint import Checkpoint
+from solution_pool import solution_pool
+from tuning import apply_tuned_parameters
 # ## Simonetti - Salles Da Cunha - Lucena Constraints model
 # \begin{equation}
 # \min \sum_{i \in V} x_i
@@ -45,32 +49,15 @@ class DOLazyCallback(ConstraintCallbackMixin, LazyConstraintCallback):
                 elif i==k:
                     graph[i].append(j)
 
-        connected = np.zeros(len(self.active_vertices))
-        i = self.active_vertices[0]
-        connected[0] = 1
-        for j in range(1,len(self.active_vertices)):
-            #If exist a path from i to j
-            if exist_path(graph, i, self.active_vertices[j]):
-                connected[j] = 1
-
+        cycles = separate(graph, self.active_vertices)
         #if connected, return True, optimal solution found
-        if connected.all():
+        if cycles is None:
             return
-        cycles = []
-        for node in self.active_vertices:
-            cyclenodes = [[node]+path for path in dfs(graph, node, node)]
-            for cycle in cyclenodes:
-                if len(cycle)>0:
-                    if (cycle not in cycles and cycle.reverse() not in cycles):
-                        cycles.append(cycle)
-            del graph[node]
-            for key in graph:
-                if node in graph[key]:
-                    graph[key].remove(node)
         #else: add constraints to the model and return false
         if len(cycles)>0:
             for cycle in cycles:
                 cycle.pop()
+                self.cuts.append(list(cycle))
                 self.register_constraints(self.model.sum(self.y[i,k] for (i,k) in self.active_edges
                 if i in cycle and k in cycle)<=self.model.sum(self.x[i] for i in cycle if i!=j)
                 for j in cycle)
@@ -80,11 +67,19 @@ class DOLazyCallback(ConstraintCallbackMixin, LazyConstraintCallback):
             self.add(cpx_lhs, cpx_sense, cpx_rhs)
 
 class Simonetti_SallesDaCunha_Lucena_Model_Lazy:
-    def __init__(self, V,E,A, status=True):
+    def __init__(self, V,E,A, status=True, timelimit=3600, mipgap=0.05,
+                 threads=0, output="results", checkpoint=None, branching=None):
         self.V = V
         self.E = E
         self.A = A
         self.status = status
+        self.timelimit = timelimit
+        self.mipgap = mipgap
+        self.threads = threads
+        self.output = output
+        self.checkpoint = Checkpoint(checkpoint) if checkpoint else None
+        self.branching = branching
+        self.cuts = []
         self.model = Model("SSL")
         self.x = self.model.binary_var_dict(V, name='x')
         self.y = self.model.integer_var_dict(E, name='y')
@@ -107,10 +102,9 @@ class Simonetti_SallesDaCunha_Lucena_Model_Lazy:
         self.model.add_constraints(self.x[i]>=0 for i in self.V)
 
         # Constraints 1.4a
+        self.domination = {}
         for v in self.V:
-            self.model.add_constraint(self.model.sum(self.x[k] for k in self.gamma_i[v])-
-                    self.model.sum(self.y[i,j] for i,j in self.E if i in self.gamma_i[v]
-                    and j in self.gamma_i[v])>=1)
+            self.domination[v] = self.model.add_constraint(self._neighbourhood_expr(v)>=1)
 
         # Constraints 1.3f
         self.model.add_constraints(self.y[i,j]<=self.x[i] for i,j in self.E)
@@ -122,20 +116,56 @@ class Simonetti_SallesDaCunha_Lucena_Model_Lazy:
         lazyct_cb.y = self.y
         lazyct_cb.V = self.V
         lazyct_cb.E = self.E
+        lazyct_cb.cuts = self.cuts
 
         self.model.lazy_callback = lazyct_cb
 
 
+    def _add_cuts(self, cycles):
+        #GSECs found by the callback in an earlier run, added as plain constraints
+        for cycle in cycles:
+            self.model.add_constraints(self.model.sum(self.y[i,k] for (i,k) in self.E
+            if i in cycle and k in cycle)<=self.model.sum(self.x[i] for i in cycle if i!=j)
+            for j in cycle)
+
+    def _neighbourhood_expr(self, v):
+        return (self.model.sum(self.x[k] for k in self.gamma_i[v])-
+                self.model.sum(self.y[i,j] for i,j in self.E if i in self.gamma_i[v]
+                and j in self.gamma_i[v]))
+
+    def _set_edge(self, i, j, active):
+        #Switch the edge (i,j) of E on or off in the built model (N-1 contingencies)
+        self.y[i,j].ub = self.model.infinity if active else 0
+        for k,l in ((i,j),(j,i)):
+            if active and l not in self.gamma_i[k]:
+                self.gamma_i[k].append(l)
+            elif not active and l in self.gamma_i[k]:
+                self.gamma_i[k].remove(l)
+            self.domination[k].lhs = self._neighbourhood_expr(k)
+
+    def solve_pool(self, k=10, gap=None):
+        #k best distinct vertex sets, or all within gap vertices of the optimum
+        return solution_pool(self, k, gap)
+
+    def _set_parameters(self):
+        self.model.parameters.timelimit = self.timelimit
+        self.model.parameters.mip.tolerances.mipgap = self.mipgap
+        self.model.parameters.threads = self.threads
+        apply_tuned_parameters(self)
+        if self.branching:
+            apply_branching(self, self.branching)
+
     def solve_model(self):
         print("SSL")
         found_optimal = False
         self.iteration = 0
-        self.model.parameters.timelimit = 3600 #No more than an hour
-        self.model.parameters.mip.tolerances.mipgap = 0.05
-        start = time()*1000
-        self.model.parameters.timelimit = 3600 #No more than an hour
+        self._set_parameters()
+        resumed = self.checkpoint.attach(self) if self.checkpoint is not None else 0
+        start = time()*1000-resumed*1000
         res = self.model.solve(clean_before_solve=True, log_output=self.status)
-        end =  time()*1000
+        end = time()*1000
+        if self.checkpoint is not None:
+            self.checkpoint.update(self, (end-start)/1000, finished=True)
         if res == None:
             return
         #print(self.model.objective_value)
@@ -150,14 +180,40 @@ class Simonetti_SallesDaCunha_Lucena_Model_Lazy:
 
     def write_info(self, time, res):
         density = int(len(self.E)*2/(len(self.V)*len(self.V)-1)*100)
-        filename = "results/SSL_lazy_"+str(len(self.V))+"_"+str(density)+".csv"
+        filename = self.output+"/SSL_lazy_"+str(len(self.V))+"_"+str(density)+".csv"
+        details = self.model.solve_details
         with open(filename, 'a') as csvfile:
             writer = csv.writer(csvfile)
-            writer.writerow(['SSL_L', len(self.V), len(self.E), time, self.model.objective_value, self.model.number_of_variables, self.model.number_of_constraints ])
+            writer.writerow(['SSL_L', len(self.V), len(self.E), time, self.model.objective_value, self.model.number_of_variables, self.model.number_of_constraints, '', details.best_bound, details.nb_nodes_processed ])
         csvfile.close()
 
 
 
+def separate(graph, active_vertices):
+    #Return None if the support graph is connected, else its cycles (graph is consumed)
+    connected = np.zeros(len(active_vertices))
+    i = active_vertices[0]
+    connected[0] = 1
+    for j in range(1,len(active_vertices)):
+        #If exist a path from i to j
+        if exist_path(graph, i, active_vertices[j]):
+            connected[j] = 1
+    if connected.all():
+        return None
+    cycles = []
+    for node in active_vertices:
+        cyclenodes = [[node]+path for path in dfs(graph, node, node)]
+        for cycle in cyclenodes:
+            if len(cycle)>0:
+                if (cycle not in cycles and cycle.reverse() not in cycles):
+                    cycles.append(cycle)
+        del graph[node]
+        for key in graph:
+            if node in graph[key]:
+                graph[key].remove(node)
+    return cycles
+
+
 def exist_path(graph, start, end):
     fringe = [(start, [])]
     while fringe:
@@ -184,8 +240,8 @@ def dfs(graph, start, end):
             fringe.append((next_state, path+[next_state]))
 
 
-def Simonetti_SallesDaCunha_Lucena_Lazy(V,E,A, status=True):
-    instance = Simonetti_SallesDaCunha_Lucena_Model_Lazy(V,E,A,status)
+def Simonetti_SallesDaCunha_Lucena_Lazy(V,E,A, status=True, **kwargs):
+    instance = Simonetti_SallesDaCunha_Lucena_Model_Lazy(V,E,A,status, **kwargs)
     instance._build_model()
     return instance.solve_model()
 
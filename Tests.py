@@ -1,23 +1,18 @@
 # # Minimum connected dominating set Problem
 
-import numpy as np
-import matplotlib.pyplot as plt
-from docplex.mp.model import Model
-from MDS import *
-from SSL import *
-from SSL_lazy import *
-from Martin import *
-from Martin_opti import *
-from MTZ import *
-from SCF import *
+import argparse
+import os
 import sys
+from checkpoint import graph_hash
+from formulations import FORMULATIONS, solve
 
-rnd = np.random
-#rnd.seed(3)
+DEFAULT_FORMULATIONS = ['MTZ', 'MTZ_tight', 'SSL', 'SSL_lazy', 'SCF', 'SCF_tight', 'SCF_benders', 'Martin', 'Martin_opti']
 
 
 # Fuctions to define graphs
-def random_graph(v,e):
+def random_graph(v,e, seed=None):
+    import numpy as np
+    rnd = np.random.RandomState(seed)
     #First edges to assure graph is connected
     initialSet = []
     visitedSet = []
@@ -26,12 +21,12 @@ def random_graph(v,e):
     for i in range(v):
         initialSet.append(i+1)
         vertices.append(i+1)
-    curVertex = rnd.choice(initialSet)
+    curVertex = int(rnd.choice(initialSet))
     initialSet.remove(curVertex)
     visitedSet.append(curVertex)
     edgeCnt = 0
     while initialSet:
-        adjVertex = rnd.choice(initialSet)
+        adjVertex = int(rnd.choice(initialSet))
         edge = (curVertex, adjVertex)
         edges.append(edge)
         edgeCnt+=1
@@ -40,8 +35,8 @@ def random_graph(v,e):
         curVertex=adjVertex
     #Second add all other edges randomly
     while edgeCnt < e:
-        node1 = rnd.randint(1,v+1)
-        node2 = rnd.randint(1,v+1)
+        node1 = int(rnd.randint(1,v+1))
+        node2 = int(rnd.randint(1,v+1))
         iteration = 0
         while (node1 == node2 or (node1,node2) in edges or (node2,node1) in edges): #If same random number
             node2 += 1
@@ -75,74 +70,90 @@ def IEEE_57_Bus_graph():
 
 
 
-def main():
-    #get argument
-    if(len(sys.argv)<2):
-        print("Use the command as:\npython3 Tests.py <method> <nbr of vertices> <degree of nodes>\nThe method can be:\n0 \trandomized graph\n1 \tIEEE_14_Bus\n2 \tIEEE_30_Bus\n3 \tIEEE_57_Bus")
-        sys.exit(1)
-    elif (sys.argv[1]=="0" and len(sys.argv)<4):
-        print("Need the number of vertices and edges for a random graph.\nUse the command as:\npython3 Tests.py <method> <nbr of vertices> <degree of nodes>")
-        sys.exit(1)
-    else:
-        switcher={
-                0:'random',
-                1:'IEEE-14-Bus',
-                2:'IEEE-30-Bus',
-                3:'IEEE-57-Bus',
-             }
-        name= switcher.get(int(sys.argv[1]), 0)
-        if (name==0):
-            print("The method available are:\n0 \trandomized graph\n1 \tIEEE_14_Bus\n2 \tIEEE_30_Bus\n3 \tIEEE_57_Bus")
-            sys.exit(1)
-
-    E = [] # Set of vertices
-    if name=="random":
-        v = int(sys.argv[2]) # Number of nodes
-        e = int(float(sys.argv[3])*v/2) # Formula to get average degree
-        E = random_graph(v,e)
-
-    elif name == "IEEE-14-Bus":
-        v=14
-        E = IEEE_14_Bus_graph()
-    elif name == "IEEE-30-Bus":
-        v=30
-        E = IEEE_30_Bus_graph()
+def read_graph(filename):
+    #One edge "i j" per line, vertices numbered from 1
+    E = []
+    with open(filename) as f:
+        for line in f:
+            if line.strip() and not line.startswith('#'):
+                i, j = line.split()[:2]
+                E.append((int(i),int(j)))
+    v = max(max(e) for e in E)
+    return v, E
 
-    elif name == "IEEE-57-Bus":
-        v=57
-        E = IEEE_57_Bus_graph()
 
-    V = [i for i in range(1,v+1)] # Set of vertices
+def adjacency_matrix(v, E):
+    edges = set(E)
     A = [] # Neighboorhood matrix
     for i in range(v):
         A.append([])
         for j in range(v):
-            if (i+1,j+1) in E or (j+1,i+1) in E or i==j:
+            if (i+1,j+1) in edges or (j+1,i+1) in edges or i==j:
                 A[i].append(1)
             else:
                 A[i].append(0)
+    return A
+
 
-    #orig_stdout = sys.stdout
-    #filename = 'out_'+name+"_"+str(v)+"_"+str(len(E))+'.txt'
-    #f = open(filename, 'a')
-    #sys.stdout = f
-    # start solver
-    status = False
-    #MDS(V,E,A, status)
-    print("\n\nSolving MTZ...")
-    Miller_Tucker_Zemlin(V,E,A, status)
-    print("\n\nSolving SSL...")
-    Simonetti_SallesDaCunha_Lucena(V,E,A, status)
-    Simonetti_SallesDaCunha_Lucena_Lazy(V,E,A, status)
-
-    print("\n\nSolving SCF...")
-    Single_Commodity_Flow(V,E,A, status)
-    print("\n\nSolving Martin...")
-    Martin(V,E,A, status)
-    Martin_opti(V,E,A,status)
-    #print("\n\n----------------------------------------------------\n\n")
-    #sys.stdout = orig_stdout
-    #f.close()
+def build_instance(method, vertices=None, degree=None, seed=None, edge_file=None):
+    if edge_file is not None:
+        v, E = read_graph(edge_file)
+    elif method == 0:
+        v = vertices # Number of nodes
+        e = int(degree*v/2) # Formula to get average degree
+        E = random_graph(v,e, seed)
+    elif method == 1:
+        v=14
+        E = IEEE_14_Bus_graph()
+    elif method == 2:
+        v=30
+        E = IEEE_30_Bus_graph()
+    elif method == 3:
+        v=57
+        E = IEEE_57_Bus_graph()
+    V = [i for i in range(1,v+1)] # Set of vertices
+    return V, E, adjacency_matrix(v, E)
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(description="Minimum connected dominating set solvers",
+        epilog="The method can be: 0 randomized graph, 1 IEEE_14_Bus, 2 IEEE_30_Bus, 3 IEEE_57_Bus")
+    parser.add_argument('method', type=int, nargs='?', choices=[0,1,2,3], default=None)
+    parser.add_argument('vertices', type=int, nargs='?', help="number of vertices of a random graph")
+    parser.add_argument('degree', type=float, nargs='?', help="average degree of a random graph")
+    parser.add_argument('-f', '--formulation', action='append', choices=list(FORMULATIONS),
+                        help="formulation to solve, can be repeated (default: all)")
+    parser.add_argument('--edge-file', help="read the graph from a file with one edge 'i j' per line")
+    parser.add_argument('--seed', type=int, default=None, help="seed of the random graph")
+    parser.add_argument('--time-limit', type=float, default=3600)
+    parser.add_argument('--gap', type=float, default=0.05, help="relative MIP gap")
+    parser.add_argument('--threads', type=int, default=0, help="0 lets CPLEX decide")
+    parser.add_argument('--output', default="results", help="directory of the result files")
+    parser.add_argument('--checkpoint', help="directory of checkpoint files, an interrupted solve resumes from them")
+    parser.add_argument('--branching', choices=['priority', 'callback'],
+                        help="branch on the vertices first, by graph-based priorities or with a branch callback")
+    parser.add_argument('--log', action='store_true', help="print the CPLEX log")
+    args = parser.parse_args(argv)
+    if args.method is None and args.edge_file is None:
+        parser.error("a method or an edge file is required")
+    if args.method == 0 and args.edge_file is None and (args.vertices is None or args.degree is None):
+        parser.error("need the number of vertices and the average degree for a random graph")
+    return args
+
+
+def main(argv=None):
+    args = parse_arguments(sys.argv[1:] if argv is None else argv)
+    V, E, A = build_instance(args.method, args.vertices, args.degree, args.seed, args.edge_file)
+    os.makedirs(args.output, exist_ok=True)
+    if args.checkpoint:
+        os.makedirs(args.checkpoint, exist_ok=True)
+    for name in args.formulation or DEFAULT_FORMULATIONS:
+        print("\n\nSolving "+name+"...")
+        checkpoint = None
+        if args.checkpoint:
+            checkpoint = os.path.join(args.checkpoint, name+"_"+str(len(V))+"_"+graph_hash(V,E)+".json")
+        solve(name, V,E,A, args.log, timelimit=args.time_limit, mipgap=args.gap,
+              threads=args.threads, output=args.output, checkpoint=checkpoint, branching=args.branching)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,214 @@
+# # Microbenchmarks of model construction and separation
+#
+# Times each formulation's __init__ and _build_model, and SSL's separation
+# (exist_path/dfs on a disconnected support graph), independently of the solve.
+# For the formulations with a template, 'patch' is the time to swap the graph
+# of an already built template, i.e. the build time per instance of a sweep.
+# Peak Python memory and the number of variables and constraints are recorded
+# too. The results are compared against a stored baseline:
+#
+# python3 benchmark.py --save-baseline          (record benchmarks/baseline.json)
+# python3 benchmark.py --threshold 0.25         (fail if 25% slower than the baseline)
+from importlib import import_module
+from time import perf_counter
+import argparse
+import json
+import os
+import random
+import sys
+import tracemalloc
+from formulations import FORMULATIONS, create_model
+from template import TEMPLATES
+from Tests import IEEE_14_Bus_graph, IEEE_30_Bus_graph, IEEE_57_Bus_graph, adjacency_matrix, random_graph
+
+SEED = 3
+RANDOM_SIZES = [20, 50, 100]
+RANDOM_DEGREE = 4
+# Martin has n^3 variables, larger graphs take minutes to build
+MAX_VERTICES = {'Martin': 30, 'Martin_opti': 30}
+SEPARATION = {'SSL': 'SSL', 'SSL_lazy': 'SSL_lazy'}
+TIMINGS = ['init', 'build', 'patch', 'separation']
+
+
+def instances():
+    graphs = [('IEEE-14-Bus', 14, IEEE_14_Bus_graph()),
+              ('IEEE-30-Bus', 30, IEEE_30_Bus_graph()),
+              ('IEEE-57-Bus', 57, IEEE_57_Bus_graph())]
+    for v in RANDOM_SIZES:
+        graphs.append(('random-'+str(v), v, random_graph(v, int(RANDOM_DEGREE*v/2), SEED)))
+    for name, v, E in graphs:
+        yield name, [i for i in range(1,v+1)], E, adjacency_matrix(v, E)
+
+
+def support_graph(V,E):
+    #Support of y seen by SSL's separation: a spanning tree split in two
+    #components by removing one tree edge, plus one chord closing a cycle of at
+    #least four vertices in the larger component (the cycles dfs looks for)
+    rnd = random.Random(SEED)
+    neighbours = {i: [] for i in V}
+    for i,j in E:
+        neighbours[i].append(j)
+        neighbours[j].append(i)
+    parent = {V[0]: None}
+    order = [V[0]]
+    for i in order:
+        for j in neighbours[i]:
+            if j not in parent:
+                parent[j] = i
+                order.append(j)
+    size = {i: 1 for i in order}
+    for i in reversed(order[1:]):
+        size[parent[i]] += size[i]
+    #The subtree closest to half of the vertices is cut off
+    cut = min(order[1:], key=lambda i: abs(len(V)-2*size[i]))
+    tree = {i: [] for i in V}
+    for i in order[1:]:
+        if i != cut:
+            tree[i].append(parent[i])
+            tree[parent[i]].append(i)
+    component = [cut]
+    for i in component:
+        component.extend(j for j in tree[i] if j not in component)
+    if 2*len(component) < len(V):
+        component = [i for i in V if i not in component]
+    #Chord between two vertices at tree distance 3 or more, an edge of the
+    #graph if there is one
+    candidates = []
+    for i in component:
+        dist = {i: 0}
+        queue = [i]
+        for k in queue:
+            for l in tree[k]:
+                if l not in dist:
+                    dist[l] = dist[k]+1
+                    queue.append(l)
+        candidates.extend((i,j) for j in dist if dist[j]>=3 and i<j)
+    in_graph = [(i,j) for i,j in candidates if j in neighbours[i]]
+    if in_graph or candidates:
+        i, j = rnd.choice(in_graph or candidates)
+        tree[i].append(j)
+        tree[j].append(i)
+    return tree
+
+
+def _time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        result = function()
+        elapsed = perf_counter()-start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _build(name, V,E,A):
+    instance = create_model(name, V,E,A, False)
+    instance._build_model()
+    return instance
+
+
+def bench_formulation(name, V,E,A, repeat):
+    row = {}
+    row['init'], instance = _time(lambda: create_model(name, V,E,A, False), repeat)
+    #_build_model adds to the model, so each repetition needs a fresh instance
+    best = None
+    for _ in range(repeat):
+        instance = create_model(name, V,E,A, False)
+        start = perf_counter()
+        instance._build_model()
+        elapsed = perf_counter()-start
+        best = elapsed if best is None else min(best, elapsed)
+    row['build'] = best
+    row['variables'] = instance.model.number_of_variables
+    row['constraints'] = instance.model.number_of_constraints
+    #Memory is traced in its own run, tracing slows down the timed ones
+    del instance
+    tracemalloc.start()
+    instance = _build(name, V,E,A)
+    row['memory'] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    if name in TEMPLATES:
+        template = create_model(name, V,E,A, False, template=True)
+        template._build_model()
+        row['patch'], _ = _time(lambda: template._patch(E, A), repeat)
+    if name in SEPARATION:
+        separate = import_module(SEPARATION[name]).separate
+        graph = support_graph(V,E)
+        active_vertices = list(V)
+        row['separation'], _ = _time(lambda: separate({i: list(graph[i]) for i in graph}, active_vertices), repeat)
+    return row
+
+
+def run(formulations, repeat):
+    results = {}
+    for instance_name, V,E,A in instances():
+        for name in formulations:
+            if len(V) > MAX_VERTICES.get(name, len(V)):
+                continue
+            print(name, instance_name, file=sys.stderr)
+            results[name+'|'+instance_name] = bench_formulation(name, V,E,A, repeat)
+    return results
+
+
+def compare(results, baseline, threshold, memory_threshold):
+    regressions = []
+    for key, row in sorted(results.items()):
+        if key not in baseline:
+            continue
+        base = baseline[key]
+        for metric in TIMINGS:
+            if metric in row and metric in base and row[metric] > base[metric]*(1+threshold):
+                regressions.append((key, metric, base[metric], row[metric]))
+        if row['memory'] > base['memory']*(1+memory_threshold):
+            regressions.append((key, 'memory', base['memory'], row['memory']))
+        for metric in ['variables', 'constraints']:
+            if row[metric] != base[metric]:
+                regressions.append((key, metric, base[metric], row[metric]))
+    return regressions
+
+
+def print_table(results):
+    print("%-32s %10s %10s %10s %10s %12s %10s %12s" % ('benchmark', 'init (s)', 'build (s)',
+            'patch (s)', 'sep. (s)', 'memory (kB)', 'variables', 'constraints'))
+    for key, row in sorted(results.items()):
+        patch = "%10.4f" % row['patch'] if 'patch' in row else "%10s" % '-'
+        separation = "%10.4f" % row['separation'] if 'separation' in row else "%10s" % '-'
+        print("%-32s %10.4f %10.4f %s %s %12d %10d %12d" % (key, row['init'], row['build'], patch, separation,
+                row['memory']//1024, row['variables'], row['constraints']))
+    print("memory: peak Python allocations while building (tracemalloc), the memory of CPLEX is not included")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Model build and separation microbenchmarks")
+    parser.add_argument('-f', '--formulation', action='append', choices=list(FORMULATIONS))
+    parser.add_argument('--repeat', type=int, default=3, help="best of n runs")
+    parser.add_argument('--baseline', default="benchmarks/baseline.json")
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument('--memory-threshold', type=float, default=0.10, help="allowed relative memory increase")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    results = run(args.formulation or list(FORMULATIONS), args.repeat)
+    print_table(results)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline at "+args.baseline+", run with --save-baseline first")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+    for key, metric, before, after in regressions:
+        print("REGRESSION %s %s: %s -> %s" % (key, metric, before, after))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
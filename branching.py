@@ -0,0 +1,147 @@
+# # Graph-aware branching on the vertex variables
+#
+# Every formulation branches on x only: the other variables (y, z, u, f) are
+# implied by the vertex set. A vertex gets a score from its degree, a sampled
+# approximation of its betweenness, whether it is a cut vertex (cut vertices
+# belong to every connected dominating set) or next to one, and whether it is
+# in the greedy heuristic solution. The scores are passed to CPLEX as
+# priorities with the direction up for the heuristic and cut vertices and down
+# otherwise ('priority'), or a branch callback always branches on the fractional
+# vertex with the best score ('callback', which implies the priorities).
+from collections import deque
+import random
+from graphs import greedy_cds, neighbourhood
+
+MODES = ('priority', 'callback')
+SAMPLES = 32
+
+
+def articulation_points(V, nbrs):
+    #Iterative Tarjan
+    index = {}
+    low = {}
+    points = set()
+    for root in V:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        children = 0
+        stack = [(root, None, iter(nbrs[root]))]
+        while stack:
+            v, parent, it = stack[-1]
+            for w in it:
+                if w not in index:
+                    index[w] = low[w] = len(index)
+                    stack.append((w, v, iter(nbrs[w])))
+                    break
+                if w != parent:
+                    low[v] = min(low[v], index[w])
+            else:
+                stack.pop()
+                if parent is None:
+                    continue
+                low[parent] = min(low[parent], low[v])
+                if parent == root:
+                    children += 1
+                elif low[v] >= index[parent]:
+                    points.add(parent)
+        if children > 1:
+            points.add(root)
+    return points
+
+
+def betweenness(V, nbrs, samples=SAMPLES, seed=0):
+    #Brandes' accumulation from a sample of sources, unweighted
+    sources = V if len(V)<=samples else random.Random(seed).sample(list(V), samples)
+    score = {v: 0.0 for v in V}
+    for s in sources:
+        order = []
+        preds = {v: [] for v in V}
+        paths = dict.fromkeys(V, 0)
+        paths[s] = 1
+        dist = {s: 0}
+        queue = deque([s])
+        while queue:
+            v = queue.popleft()
+            order.append(v)
+            for w in nbrs[v]:
+                if w not in dist:
+                    dist[w] = dist[v]+1
+                    queue.append(w)
+                if dist[w] == dist[v]+1:
+                    paths[w] += paths[v]
+                    preds[w].append(v)
+        delta = dict.fromkeys(V, 0.0)
+        for w in reversed(order):
+            for v in preds[w]:
+                delta[v] += paths[v]/paths[w]*(1+delta[w])
+            if w != s:
+                score[w] += delta[w]
+    return score
+
+
+def priorities(V,E, seed=0):
+    #Returns {vertex: (priority, up)}, priority 1 is branched on last
+    nbrs = neighbourhood(V,E)
+    cut = articulation_points(V, nbrs)
+    try:
+        heuristic = greedy_cds(V, nbrs)
+    except ValueError:
+        heuristic = set()
+    between = betweenness(V, nbrs, seed=seed)
+    max_degree = max(len(nbrs[v]) for v in V) or 1
+    max_between = max(between.values()) or 1
+    score = {}
+    for v in V:
+        score[v] = (len(nbrs[v])/max_degree+between[v]/max_between+
+                    2*(v in cut)+0.5*bool(nbrs[v]&cut)+(v in heuristic))
+    ranked = sorted(V, key=lambda v: score[v])
+    return {v: (rank+1, v in heuristic or v in cut) for rank, v in enumerate(ranked)}
+
+
+def _branch_callback():
+    from cplex.callbacks import BranchCallback
+
+    class VertexBranchCallback(BranchCallback):
+        def __init__(self, env):
+            BranchCallback.__init__(self, env)
+            self.nb_branches = 0
+
+        def __call__(self):
+            values = self.get_values(self.indices)
+            best = None
+            for v, index, value in zip(self.vertices, self.indices, values):
+                if 1e-6 < value < 1-1e-6 and (best is None or self.order[v] > self.order[best[0]]):
+                    best = (v, index)
+            #x integral: the remaining variables are left to CPLEX
+            if best is None:
+                return
+            v, index = best
+            estimate = self.get_objective_value()
+            branches = [(index, 'L', 1.0), (index, 'U', 0.0)]
+            if not self.up[v]:
+                branches.reverse()
+            for branch in branches:
+                self.make_branch(estimate, variables=[branch])
+            self.nb_branches += 1
+
+    return VertexBranchCallback
+
+
+def apply_branching(instance, mode):
+    #Called from _set_parameters, once per solve
+    if mode not in MODES:
+        raise ValueError("branching must be one of "+", ".join(MODES))
+    if getattr(instance, 'priorities', None) is None:
+        instance.priorities = priorities(instance.V, instance.E)
+    cpx = instance.model.get_cplex()
+    direction = cpx.order.branch_direction
+    cpx.order.set([(instance.x[v].index, priority, direction.up if up else direction.down)
+                   for v, (priority, up) in instance.priorities.items()])
+    if mode == 'callback' and getattr(instance, 'branch_cb', None) is None:
+        cb = instance.model.register_callback(_branch_callback())
+        cb.vertices = list(instance.V)
+        cb.indices = [instance.x[v].index for v in cb.vertices]
+        cb.order = {v: priority for v, (priority, _) in instance.priorities.items()}
+        cb.up = {v: up for v, (_, up) in instance.priorities.items()}
+        instance.branch_cb = cb
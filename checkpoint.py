@@ -0,0 +1,122 @@
+# # Checkpoint and resume of long solves
+#
+# A checkpoint file (JSON) holds the incumbent (values by variable name), its
+# objective, the best bound, the GSECs added so far by SSL and SSL_lazy (the
+# feasibility cuts of SCF_benders), the SSL iteration and the elapsed time. It
+# is saved on every new incumbent, at least every `interval` seconds, and after
+# each SSL iteration. When a solve starts with an existing checkpoint the cuts
+# are added back, the saved incumbent is the MIP start and only the remaining
+# time budget is used. The file records a key of the formulation and the graph:
+# a checkpoint of another instance, or of a finished solve, is not resumed.
+from hashlib import sha1
+import json
+import os
+from time import time
+
+
+def graph_hash(V,E):
+    edges = sorted((int(min(i,j)), int(max(i,j))) for i,j in E)
+    return sha1(json.dumps([sorted(int(i) for i in V), edges]).encode()).hexdigest()[:12]
+
+
+def instance_key(instance):
+    #Formulation (and its variant) and graph: cuts only hold for the graph they come from
+    name = getattr(instance, 'name', type(instance).__name__)
+    return name+"_"+graph_hash(instance.V, instance.E)
+
+
+def _plain(value):
+    #Vertex ids of random graphs are numpy integers, which json cannot write
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return int(value)
+
+
+class Checkpoint:
+    def __init__(self, filename, interval=60):
+        self.filename = filename
+        self.interval = interval
+        self.state = self._empty()
+        if os.path.exists(filename):
+            with open(filename) as f:
+                self.state.update(json.load(f))
+        #Elapsed time when the current solve started
+        self.offset = self.state['elapsed']
+        self.saved = 0
+
+    def _empty(self):
+        return {'key': None, 'incumbent': None, 'objective': None, 'bound': None, 'cuts': [],
+                'elapsed': 0, 'iteration': 0, 'finished': False}
+
+    def save(self):
+        tmp = self.filename+'.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.filename)
+        self.saved = time()
+
+    def _cuts(self, instance):
+        return [_plain(cut) for cut in getattr(instance, 'cuts', [])]
+
+    def attach(self, instance):
+        model = instance.model
+        key = instance_key(instance)
+        if self.state['key'] != key or self.state['finished']:
+            #Another instance, or a solve that has finished: start over
+            self.state = self._empty()
+            self.state['key'] = key
+            self.offset = 0
+        cuts = self.state['cuts']
+        if cuts:
+            instance.cuts.extend(cuts)
+            instance._add_cuts(cuts)
+        if self.state['incumbent']:
+            start = model.new_solution()
+            for name, value in self.state['incumbent'].items():
+                var = model.get_var_by_name(name)
+                if var is not None:
+                    start.add_var_value(var, value)
+            model.add_mip_start(start)
+        model.parameters.timelimit = max(1, instance.timelimit-self.offset)
+        for listener in _listeners(self, instance):
+            model.add_progress_listener(listener)
+        return self.offset
+
+    def update(self, instance, elapsed, iteration=None, finished=False):
+        self.state['cuts'] = self._cuts(instance)
+        self.state['elapsed'] = elapsed
+        self.state['finished'] = finished
+        if iteration is not None:
+            self.state['iteration'] = iteration
+        self.offset = elapsed
+        self.save()
+
+
+def _listeners(checkpoint, instance):
+    from docplex.mp.progress import ProgressClock, ProgressListener, SolutionListener
+
+    class IncumbentListener(SolutionListener):
+        def __init__(self):
+            SolutionListener.__init__(self, ProgressClock.Objective)
+            self.improved = False
+
+        def notify_solution(self, solution):
+            checkpoint.state['incumbent'] = {var.name: value for var, value in solution.iter_var_values()}
+            checkpoint.state['objective'] = solution.objective_value
+            self.improved = True
+
+    #Every progress event, also before the first incumbent and during stalls
+    class SaveListener(ProgressListener):
+        def __init__(self):
+            ProgressListener.__init__(self, ProgressClock.All)
+
+        def notify_progress(self, data):
+            checkpoint.state['bound'] = data.best_bound
+            if incumbent.improved or time()-checkpoint.saved>=checkpoint.interval:
+                incumbent.improved = False
+                checkpoint.state['cuts'] = checkpoint._cuts(instance)
+                checkpoint.state['elapsed'] = checkpoint.offset+data.time
+                checkpoint.save()
+
+    incumbent = IncumbentListener()
+    return [incumbent, SaveListener()]
@@ -0,0 +1,123 @@
+# # N-1 contingency analysis
+#
+# Solves the connected dominating set of every single-branch outage of a
+# topology. Each worker process builds the model of the formulation once, warm
+# starts it with the solution of the intact topology, and for each outage only
+# switches the edge off (edge variable bounds and domination coefficients)
+# before solving again and switching it back on.
+from multiprocessing import Pool
+from time import time
+import argparse
+import csv
+import os
+import sys
+from formulations import create_model
+
+_instance = None
+
+
+def _scenario_model(name, V,E,A, status, options):
+    instance = create_model(name, V,E,A, status, **options)
+    if not hasattr(instance, '_set_edge'):
+        raise ValueError(name+" does not support contingency analysis")
+    instance._build_model()
+    instance._set_parameters()
+    return instance
+
+
+def _solve(instance):
+    start = time()*1000
+    res = instance.model.solve(log_output=instance.status)
+    end = time()*1000
+    elapsed = int(round(end-start))
+    if res is None:
+        return None, [], elapsed
+    active_vertices = [i for i in instance.V if res.get_value(instance.x[i])>0.9]
+    return res.objective_value, active_vertices, elapsed
+
+
+def _warm_start(instance, vertices):
+    start = instance.model.new_solution()
+    for i in instance.V:
+        start.add_var_value(instance.x[i], 1 if i in vertices else 0)
+    instance.model.add_mip_start(start)
+
+
+def _init_worker(name, V,E,A, status, options, base_vertices):
+    global _instance
+    _instance = _scenario_model(name, V,E,A, status, options)
+    if base_vertices:
+        _warm_start(_instance, base_vertices)
+
+
+def _solve_outage(edge):
+    i,j = edge
+    _instance._set_edge(i,j, False)
+    try:
+        objective, vertices, elapsed = _solve(_instance)
+    finally:
+        _instance._set_edge(i,j, True)
+    return i, j, objective, vertices, elapsed
+
+
+# Returns the solution of the intact graph (objective, vertices, time in ms) and
+# one row (i, j, objective, vertices, time in ms) per outage (default: every
+# edge of E, an outage is given in either orientation). The objective is None
+# when the outage leaves no connected dominating set, e.g. when a bridge is
+# removed. With several processes every worker uses one CPLEX thread unless
+# threads is given.
+def contingency_analysis(name, V,E,A, outages=None, processes=None, status=False, **options):
+    global _instance
+    edges = set(E)
+    if outages is None:
+        outages = list(E)
+    else:
+        outages = [(i,j) if (i,j) in edges else (j,i) for i,j in outages]
+        for i,j in outages:
+            if (i,j) not in edges:
+                raise ValueError("outage "+str(j)+"-"+str(i)+" is not an edge")
+    if processes != 1:
+        options.setdefault('threads', 1)
+    base = _scenario_model(name, V,E,A, status, options)
+    base_solution = _solve(base)
+    if processes == 1:
+        _instance = base
+        _warm_start(base, base_solution[1])
+        rows = [_solve_outage(edge) for edge in outages]
+    else:
+        with Pool(processes, _init_worker, (name, V,E,A, status, options, base_solution[1])) as pool:
+            rows = pool.map(_solve_outage, outages)
+    return base_solution, rows
+
+
+def write_table(name, V,E, base_solution, rows, output="results"):
+    filename = output+"/contingency_"+name+"_"+str(len(V))+"_"+str(len(E))+".csv"
+    with open(filename, 'w') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['outage', 'objective', 'vertices', 'time'])
+        writer.writerow(['none', base_solution[0], ' '.join(map(str, base_solution[1])), base_solution[2]])
+        for i, j, objective, vertices, elapsed in rows:
+            writer.writerow([str(i)+'-'+str(j), objective, ' '.join(map(str, vertices)), elapsed])
+    return filename
+
+
+def main(argv=None):
+    from Tests import build_instance
+    parser = argparse.ArgumentParser(description="N-1 contingency analysis of the connected dominating set")
+    parser.add_argument('method', type=int, choices=[1,2,3], help="1 IEEE_14_Bus, 2 IEEE_30_Bus, 3 IEEE_57_Bus")
+    parser.add_argument('-f', '--formulation', default='SSL_lazy')
+    parser.add_argument('--processes', type=int, default=None, help="number of workers (default: all cores)")
+    parser.add_argument('--time-limit', type=float, default=3600)
+    parser.add_argument('--gap', type=float, default=0.05)
+    parser.add_argument('--threads', type=int, default=1, help="CPLEX threads per worker")
+    parser.add_argument('--output', default="results")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    V, E, A = build_instance(args.method)
+    base_solution, rows = contingency_analysis(args.formulation, V,E,A, processes=args.processes,
+            timelimit=args.time_limit, mipgap=args.gap, threads=args.threads, output=args.output)
+    os.makedirs(args.output, exist_ok=True)
+    print(write_table(args.formulation, V,E, base_solution, rows, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# # Formulation registry
+#
+# Maps a formulation name to the module, model class and solve function that
+# implement it. Modules are imported only when a formulation is selected, so
+# that importing the registry (and starting the command line) stays cheap.
+from importlib import import_module
+
+# name: (module, model class, solve function, model options)
+FORMULATIONS = {
+    'MTZ': ('MTZ', 'Miller_Tucker_Zemlin_Model', 'Miller_Tucker_Zemlin', {}),
+    'MTZ_tight': ('MTZ', 'Miller_Tucker_Zemlin_Model', 'Miller_Tucker_Zemlin_tight', {'tight': True}),
+    'SSL': ('SSL', 'Simonetti_SallesDaCunha_Lucena_Model', 'Simonetti_SallesDaCunha_Lucena', {}),
+    'SSL_lazy': ('SSL_lazy', 'Simonetti_SallesDaCunha_Lucena_Model_Lazy',
+                 'Simonetti_SallesDaCunha_Lucena_Lazy', {}),
+    'SCF': ('SCF', 'Single_Commodity_Flow_Model', 'Single_Commodity_Flow', {}),
+    'SCF_tight': ('SCF', 'Single_Commodity_Flow_Model', 'Single_Commodity_Flow_tight', {'tight': True}),
+    'SCF_benders': ('SCF_benders', 'Single_Commodity_Flow_Benders_Model', 'Single_Commodity_Flow_Benders', {}),
+    'Martin': ('Martin', 'Martin_Model', 'Martin', {}),
+    'Martin_opti': ('Martin_opti', 'Martin_opti_Model', 'Martin_opti', {}),
+}
+
+
+def _entry(name):
+    if name not in FORMULATIONS:
+        raise KeyError("Unknown formulation '"+name+"', available: "+", ".join(FORMULATIONS))
+    return FORMULATIONS[name]
+
+
+def load_function(name):
+    module, _, function, _ = _entry(name)
+    return getattr(import_module(module), function)
+
+
+def load_model(name):
+    module, cls, _, options = _entry(name)
+    return getattr(import_module(module), cls), dict(options)
+
+
+def formulation_name(instance):
+    #Registry name of a model instance: the one given to create_model, else the
+    #entry of its class whose options match, the most specific one first
+    if getattr(instance, 'formulation', None) is not None:
+        return instance.formulation
+    matches = [(len(options), name) for name, (_, cls, _, options) in FORMULATIONS.items()
+               if type(instance).__name__ == cls and all(getattr(instance, k, None) == v for k, v in options.items())]
+    return max(matches)[1] if matches else type(instance).__name__
+
+
+def create_model(name, V,E,A, status=True, **kwargs):
+    cls, options = load_model(name)
+    options.update(kwargs)
+    instance = cls(V,E,A,status, **options)
+    instance.formulation = name
+    return instance
+
+
+def solve(name, V,E,A, status=True, **kwargs):
+    return load_function(name)(V,E,A,status, **kwargs)
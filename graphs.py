@@ -0,0 +1,117 @@
+# # Graph helpers shared by the heuristics and the formulations
+#
+# Neighbourhoods as sets, connected components of a vertex subset, the
+# Guha-Khuller greedy connected dominating set with its local pruning, and a
+# spanning tree of a connected vertex subset.
+from collections import deque
+import heapq
+
+
+def neighbourhood(V,E):
+    nbrs = {i: set() for i in V}
+    for i,j in E:
+        if i!=j:
+            nbrs[i].add(j)
+            nbrs[j].add(i)
+    return nbrs
+
+
+def is_connected_dominating_set(V, nbrs, D):
+    D = set(D)
+    if not D or any(i not in D and not nbrs[i]&D for i in V):
+        return False
+    return len(components(D, nbrs)[0])==1
+
+
+def components(D, nbrs):
+    component = {}
+    roots = []
+    for s in D:
+        if s in component:
+            continue
+        component[s] = len(roots)
+        roots.append(s)
+        stack = [s]
+        while stack:
+            u = stack.pop()
+            for v in nbrs[u]:
+                if v in D and v not in component:
+                    component[v] = component[s]
+                    stack.append(v)
+    return roots, component
+
+
+def greedy_cds(V, nbrs):
+    #Guha-Khuller: grow a tree from the highest degree vertex, always adding the
+    #dominated vertex that dominates the most new vertices. Gains only decrease,
+    #so they are kept in a lazily updated heap
+    if len(V)==1:
+        return set(V)
+    start = max(V, key=lambda i: len(nbrs[i]))
+    D = {start}
+    dominated = {start}|nbrs[start]
+    heap = [(-len(nbrs[i]-dominated), i) for i in nbrs[start]]
+    heapq.heapify(heap)
+    while len(dominated)<len(V):
+        if not heap:
+            raise ValueError("the graph is not connected")
+        gain, best = heapq.heappop(heap)
+        if best in D:
+            continue
+        current = len(nbrs[best]-dominated)
+        if current<-gain:
+            heapq.heappush(heap, (-current, best))
+            continue
+        D.add(best)
+        for v in nbrs[best]-dominated:
+            heapq.heappush(heap, (-len(nbrs[v]-dominated), v))
+        dominated |= nbrs[best]
+    return prune(D, nbrs, sorted(D, key=lambda i: len(nbrs[i])))
+
+
+def _still_connected(D, nbrs, u, radius=4):
+    #Whether the neighbours of u in D stay connected without u, looking only
+    #radius hops around u (a missed detour conservatively keeps u)
+    targets = nbrs[u]&D
+    if len(targets)<=1:
+        return True
+    first = next(iter(targets))
+    seen = {first}
+    frontier = [first]
+    for _ in range(radius):
+        following = []
+        for w in frontier:
+            for v in nbrs[w]:
+                if v in D and v!=u and v not in seen:
+                    seen.add(v)
+                    following.append(v)
+        frontier = following
+        if targets<=seen:
+            return True
+    return targets<=seen
+
+
+def prune(D, nbrs, candidates):
+    for u in candidates:
+        if len(D)==1:
+            break
+        D.discard(u)
+        if (not nbrs[u]&D) or any(w not in D and not nbrs[w]&D for w in nbrs[u]) \
+                or not _still_connected(D, nbrs, u):
+            D.add(u)
+    return D
+
+
+def spanning_edges(D, nbrs):
+    start = next(iter(D))
+    seen = {start}
+    queue = deque([start])
+    edges = []
+    while queue:
+        u = queue.popleft()
+        for v in nbrs[u]:
+            if v in D and v not in seen:
+                seen.add(v)
+                edges.append((u,v))
+                queue.append(v)
+    return edges
@@ -0,0 +1,326 @@
+# # Partition-based heuristic for large graphs
+#
+# The greedy connected dominating set of the whole graph is improved region by
+# region. The graph is split into balanced regions with few cut edges by a
+# multilevel partitioner (heavy-edge matching, greedy graph growing, boundary
+# refinement), and the part of the greedy set in every region is solved again
+# exactly with one of the formulations, in a pool of worker processes, with the
+# rest of the set fixed. Solving the regions on their own and connecting the
+# regional sets across the boundaries gave larger sets than the greedy
+# heuristic, even with the neighbouring vertices of the region as a halo: on
+# random graphs and grids most of the regional set is spent on its own
+# connectivity.
+from collections import deque
+from importlib.util import find_spec
+from multiprocessing import Pool
+from time import time
+import argparse
+import math
+import os
+import random
+import sys
+from graphs import components, greedy_cds, is_connected_dominating_set, neighbourhood, spanning_edges
+
+
+# ## Multilevel partitioner
+
+def _coarsen(weights, adj, rnd):
+    #Heavy-edge matching, every vertex is merged with at most one neighbour
+    order = list(adj)
+    rnd.shuffle(order)
+    match = {}
+    for u in order:
+        if u in match:
+            continue
+        best, best_weight = u, 0
+        for v,w in adj[u].items():
+            if v not in match and w>best_weight:
+                best, best_weight = v, w
+        match[u] = best
+        match[best] = u
+    mapping = {}
+    count = 0
+    for u in order:
+        if u not in mapping:
+            mapping[u] = mapping[match[u]] = count
+            count += 1
+    coarse_weights = {}
+    coarse_adj = {}
+    for u in adj:
+        cu = mapping[u]
+        coarse_weights[cu] = coarse_weights.get(cu,0)+weights[u]
+        coarse_adj.setdefault(cu, {})
+        for v,w in adj[u].items():
+            cv = mapping[v]
+            if cu!=cv:
+                coarse_adj[cu][cv] = coarse_adj[cu].get(cv,0)+w
+    return coarse_weights, coarse_adj, mapping
+
+
+def _grow(weights, adj, k, rnd):
+    #Greedy graph growing: k-1 breadth-first regions of the target weight, the
+    #rest is the last one. Heavy coarse vertices overshoot the target and can
+    #leave regions empty, those split the heaviest region in two
+    target = sum(weights.values())/k
+    nodes = list(adj)
+    rnd.shuffle(nodes)
+    part = {}
+    seed = 0
+    for p in range(k-1):
+        load = 0
+        while load<target and seed<len(nodes):
+            if nodes[seed] in part:
+                seed += 1
+                continue
+            queue = deque([nodes[seed]])
+            part[nodes[seed]] = p
+            load += weights[nodes[seed]]
+            while queue and load<target:
+                u = queue.popleft()
+                for v in adj[u]:
+                    if v not in part and load<target:
+                        part[v] = p
+                        load += weights[v]
+                        queue.append(v)
+    for u in nodes:
+        part.setdefault(u, k-1)
+    load = [0]*k
+    for u,p in part.items():
+        load[p] += weights[u]
+    for p in range(k):
+        if load[p]:
+            continue
+        q = max(range(k), key=lambda r: load[r])
+        members = [u for u in nodes if part[u]==q]
+        if len(members)<=1:
+            break
+        queue = deque([members[0]])
+        part[members[0]] = p
+        moved = weights[members[0]]
+        while queue and moved<load[q]/2:
+            u = queue.popleft()
+            for v in adj[u]:
+                if part[v]==q and moved<load[q]/2:
+                    part[v] = p
+                    moved += weights[v]
+                    queue.append(v)
+        load[p] = moved
+        load[q] -= moved
+    return part
+
+
+def _refine(part, weights, adj, k, max_weight, passes=4):
+    #Move boundary vertices to the neighbouring region that reduces the cut (or
+    #the imbalance). Only the boundary is scanned, then only around the moves
+    load = [0]*k
+    for u,p in part.items():
+        load[p] += weights[u]
+    active = [u for u in adj if any(part[v]!=part[u] for v in adj[u])]
+    for _ in range(passes):
+        touched = set()
+        for u in active:
+            p = part[u]
+            connection = {}
+            for v,w in adj[u].items():
+                connection[part[v]] = connection.get(part[v],0)+w
+            if len(connection)<=1 and p in connection:
+                continue
+            internal = connection.get(p,0)
+            best, best_gain = p, 0
+            for q,c in connection.items():
+                if q==p or load[q]+weights[u]>max_weight:
+                    continue
+                gain = c-internal
+                if gain>best_gain or (gain==best_gain==0 and best==p and load[q]+weights[u]<load[p]):
+                    best, best_gain = q, gain
+            if best!=p:
+                load[p] -= weights[u]
+                load[best] += weights[u]
+                part[u] = best
+                touched.add(u)
+                touched.update(adj[u])
+        if not touched:
+            break
+        active = [u for u in touched if any(part[v]!=part[u] for v in adj[u])]
+    return part
+
+
+IMBALANCE = 0.05
+
+
+def partition(V,E, k, seed=0, imbalance=IMBALANCE):
+    if k<=1:
+        return {i: 0 for i in V}
+    rnd = random.Random(seed)
+    adj = {i: {} for i in V}
+    for i,j in E:
+        if i!=j:
+            adj[i][j] = adj[i].get(j,0)+1
+            adj[j][i] = adj[j].get(i,0)+1
+    weights = {i: 1 for i in V}
+    levels = []
+    while len(adj)>20*k:
+        coarse_weights, coarse_adj, mapping = _coarsen(weights, adj, rnd)
+        if len(coarse_adj)>0.9*len(adj):
+            break
+        levels.append((weights, adj, mapping))
+        weights, adj = coarse_weights, coarse_adj
+    max_weight = (1+imbalance)*len(V)/k
+    part = _refine(_grow(weights, adj, k, rnd), weights, adj, k, max_weight)
+    for weights, adj, mapping in reversed(levels):
+        part = {u: part[mapping[u]] for u in adj}
+        part = _refine(part, weights, adj, k, max_weight)
+    return part
+
+
+# ## Exact improvement of the regions
+
+def _region_task(region, D, nbrs, formulation, timelimit):
+    #Subproblem of a region for the current set D. The vertices of D outside the
+    #region are kept, every component they form is contracted into one selected
+    #vertex. The outside neighbours that are not in D cannot be chosen but must
+    #stay dominated; the vertices next to the kept part are dominated already.
+    #Local ids: the region, then its outside neighbours, then the components
+    members = set(region)
+    outside = sorted({v for u in region for v in nbrs[u] if v not in members and v not in D})
+    local = region+outside
+    index = {u: k+1 for k,u in enumerate(local)}
+    _, component = components(D-members, nbrs)
+    fixed = {}
+    edges = set()
+    for u in region:
+        for v in nbrs[u]:
+            if v in members:
+                if index[u]<index[v]:
+                    edges.add((index[u], index[v]))
+            elif v in D:
+                if component[v] not in fixed:
+                    fixed[component[v]] = len(local)+len(fixed)+1
+                edges.add((index[u], fixed[component[v]]))
+            else:
+                edges.add((index[u], index[v]))
+    dominated = [index[u] for u in local if any(v in D and v not in members for v in nbrs[u])]
+    dominated += list(fixed.values())
+    return region, len(local), len(fixed), sorted(edges), dominated, formulation, timelimit
+
+
+def _improve_region(task):
+    try:
+        return _solve_exact(*task)
+    except ImportError:
+        return None
+    except Exception as e:
+        #Solver limits and failures: the region keeps its vertices
+        print("region not solved:", e, file=sys.stderr)
+        return None
+
+
+def _solve_exact(region, size, fixed, edges, dominated, formulation, timelimit):
+    from formulations import create_model
+    from Tests import adjacency_matrix
+    V = [k+1 for k in range(size+fixed)]
+    instance = create_model(formulation, V,edges, adjacency_matrix(len(V), edges), False,
+                            timelimit=timelimit, threads=1)
+    instance._build_model()
+    for i in V[len(region):size]:
+        instance.x[i].ub = 0
+    for i in V[size:]:
+        instance.x[i].lb = 1
+    #Domination rows: a list in the order of V, or a dict by vertex
+    rows = getattr(instance, 'domination', None)
+    if rows is not None:
+        rows = rows if isinstance(rows, dict) else dict(zip(V, rows))
+        instance.model.remove_constraints([rows[i] for i in dominated])
+    instance._set_parameters()
+    res = instance.model.solve()
+    if res is None:
+        return None
+    return {region[i-1] for i in V[:len(region)] if res.get_value(instance.x[i])>0.9}
+
+
+def _exact_available():
+    return find_spec('docplex') is not None
+
+
+def partition_cds(V,E, parts=None, processes=None, exact_limit=60, formulation='SSL_lazy',
+                  timelimit=60, seed=0):
+    nbrs = neighbourhood(V,E)
+    D = greedy_cds(V, nbrs)
+    #Regions of at most exact_limit vertices by default, the imbalance allowed
+    #by the partitioner included. Larger regions are left as they are, so
+    #without docplex, or with larger regions only, the greedy set is returned
+    if parts is None:
+        parts = math.ceil(len(V)*(1+IMBALANCE)/exact_limit)
+    if not _exact_available() or len(V)/parts>exact_limit:
+        return sorted(D), spanning_edges(D, nbrs)
+    part = partition(V,E, parts, seed)
+    regions = {}
+    for u in V:
+        regions.setdefault(part[u], []).append(u)
+    #The regions of a round are solved for the same set: a solution is kept when
+    #it is smaller and the whole set is still a connected dominating set, which
+    #an earlier region may have changed. Those regions are solved again for the
+    #new set in the next round
+    pending = [region for region in regions.values() if len(region)<=exact_limit]
+    pool = Pool(processes) if processes!=1 else None
+    try:
+        while pending:
+            tasks = [_region_task(region, D, nbrs, formulation, timelimit) for region in pending
+                     if len(D.intersection(region))>1]
+            if pool is None:
+                solutions = [_improve_region(task) for task in tasks]
+            else:
+                solutions = pool.map(_improve_region, tasks,
+                                     chunksize=max(1, len(tasks)//(4*(processes or os.cpu_count()))))
+            pending = []
+            improved = False
+            for task, chosen in zip(tasks, solutions):
+                region = task[0]
+                candidate = (D-set(region))|(chosen or set())
+                if chosen is None or len(candidate)>=len(D):
+                    continue
+                if is_connected_dominating_set(V, nbrs, candidate):
+                    D = candidate
+                    improved = True
+                else:
+                    pending.append(region)
+            if not improved:
+                break
+    finally:
+        if pool is not None:
+            pool.close()
+    return sorted(D), spanning_edges(D, nbrs)
+
+
+def main(argv=None):
+    from Tests import IEEE_14_Bus_graph, IEEE_30_Bus_graph, IEEE_57_Bus_graph, random_graph, read_graph
+    parser = argparse.ArgumentParser(description="Partition-based connected dominating set heuristic")
+    parser.add_argument('method', type=int, nargs='?', choices=[0,1,2,3], default=None)
+    parser.add_argument('vertices', type=int, nargs='?')
+    parser.add_argument('degree', type=float, nargs='?')
+    parser.add_argument('--edge-file')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--parts', type=int, default=None, help="number of regions (default: n*1.05/exact-limit)")
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--exact-limit', type=int, default=60, help="largest region solved exactly")
+    parser.add_argument('-f', '--formulation', default='SSL_lazy', help="formulation of the exact regions")
+    parser.add_argument('--time-limit', type=float, default=60, help="per region")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    #No adjacency matrix here, it would not fit in memory for large graphs
+    if args.edge_file is not None:
+        v, E = read_graph(args.edge_file)
+    elif args.method == 0:
+        v = args.vertices
+        E = random_graph(v, int(args.degree*v/2), args.seed)
+    else:
+        v, E = [(14, IEEE_14_Bus_graph()), (30, IEEE_30_Bus_graph()), (57, IEEE_57_Bus_graph())][args.method-1]
+    V = [i for i in range(1,v+1)]
+    start = time()
+    active_vertices, active_edges = partition_cds(V,E, args.parts, args.processes, args.exact_limit,
+                                                  args.formulation, args.time_limit)
+    print(len(V), len(E), len(active_vertices), round(time()-start, 3))
+    print(active_vertices)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# # Progress listeners shared by the formulations
+#
+# RootBound keeps the first bound CPLEX reports at the root node, before the
+# root cuts tighten it: the bound of the LP relaxation of the formulation.
+# Listeners are called on every progress event (ProgressClock.All), also before
+# the first incumbent.
+
+
+def root_bound_listener():
+    from docplex.mp.progress import ProgressClock, ProgressListener
+
+    class RootBound(ProgressListener):
+        def __init__(self):
+            ProgressListener.__init__(self, ProgressClock.All)
+            self.bound = None
+
+        def notify_progress(self, data):
+            if self.bound is None and data.current_nb_nodes == 0:
+                self.bound = data.best_bound
+
+    return RootBound()
+
+
+def solve_with_root_bound(instance):
+    #Solves instance.model and stores the root bound in instance.root_bound; a
+    #model solved before the first progress event keeps its final bound
+    listener = root_bound_listener()
+    instance.model.add_progress_listener(listener)
+    try:
+        res = instance.model.solve(clean_before_solve=True, log_output=instance.status)
+    finally:
+        instance.model.remove_progress_listener(listener)
+    details = instance.model.solve_details
+    instance.root_bound = listener.bound if listener.bound is not None else details.best_bound
+    return res
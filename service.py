@@ -0,0 +1,256 @@
+# # Local solve service
+#
+# Long-running asyncio server with a small HTTP/JSON interface. Jobs are queued
+# and solved on a bounded pool of worker processes that import docplex and the
+# formulations once, when they start, so that repeated small requests do not
+# pay the startup cost.
+#
+# POST   /jobs       {"formulation": "SSL_lazy", "edges": [[1,2], ...], "vertices": 14,
+#                     "time_limit": 60, "gap": 0.05, "threads": 1}  -> {"id": ...}
+# GET    /jobs       all jobs
+# GET    /jobs/<id>  status (queued, running, done, failed, cancelled), progress and result
+# DELETE /jobs/<id>  cancel a queued or running job
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from importlib import import_module
+from multiprocessing import Manager
+from time import time
+import argparse
+import asyncio
+import json
+import os
+import queue
+import sys
+from formulations import FORMULATIONS, create_model
+
+STATUS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+          500: 'Internal Server Error'}
+
+
+def _warm_up(modules):
+    for module in modules:
+        import_module(module)
+
+
+def _progress_listener(job_id, progress, cancelled, instance):
+    from docplex.mp.progress import ProgressListener, ProgressClock
+
+    #Called on every progress event, so that a cancellation is seen before the
+    #first incumbent and during stalls; the progress sent and the cancel flag,
+    #which lives in the manager process, are throttled
+    class JobListener(ProgressListener):
+        def __init__(self):
+            ProgressListener.__init__(self, ProgressClock.All)
+            self.sent = 0
+            self.checked = 0
+            self.incumbent = None
+
+        def notify_progress(self, data):
+            now = time()
+            incumbent = data.current_objective if data.has_incumbent else None
+            if incumbent != self.incumbent or now-self.sent>=1:
+                self.incumbent = incumbent
+                self.sent = now
+                progress.put((job_id, 'progress', {'incumbent': incumbent, 'bound': data.best_bound,
+                              'gap': data.mip_gap, 'nodes': data.current_nb_nodes, 'time': data.time}))
+            if now-self.checked<0.5:
+                return
+            self.checked = now
+            if cancelled.get(job_id):
+                #SSL checks stopped between its iterations
+                instance.stopped = True
+                self.abort()
+
+    return JobListener()
+
+
+def _run_job(job_id, request, progress, cancelled):
+    #Solver exceptions (DOcplexLimitsExceeded, ...) cannot always be unpickled in
+    #the service, which would break the pool: only their message is sent back
+    try:
+        return _solve_job(job_id, request, progress, cancelled)
+    except Exception as e:
+        raise RuntimeError(type(e).__name__+": "+str(e)) from None
+
+
+def _solve_job(job_id, request, progress, cancelled):
+    from Tests import adjacency_matrix
+    if cancelled.get(job_id):
+        return None
+    progress.put((job_id, 'running', None))
+    v = request['vertices']
+    V = [i for i in range(1,v+1)]
+    E = [tuple(e) for e in request['edges']]
+    os.makedirs(request['output'], exist_ok=True)
+    instance = create_model(request['formulation'], V,E, adjacency_matrix(v, E), False,
+                            timelimit=request['time_limit'], mipgap=request['gap'],
+                            threads=request['threads'], output=request['output'])
+    instance._build_model()
+    instance.model.add_progress_listener(_progress_listener(job_id, progress, cancelled, instance))
+    solution = instance.solve_model()
+    if solution is None or solution[0] is None:
+        return {'objective': None, 'vertices': [], 'edges': []}
+    res, active_vertices, active_edges = solution
+    return {'objective': res.objective_value, 'vertices': active_vertices, 'edges': active_edges}
+
+
+class SolveService:
+    def __init__(self, workers=None, output="results"):
+        self.output = output
+        self.jobs = {}
+        self.count = 0
+        self.manager = Manager()
+        self.progress = self.manager.Queue()
+        self.cancelled = self.manager.dict()
+        self.workers = workers
+        self.executor = self._executor()
+
+    def _executor(self):
+        modules = sorted({module for module, _, _, _ in FORMULATIONS.values()})
+        return ProcessPoolExecutor(self.workers, initializer=_warm_up, initargs=(modules+['Tests'],))
+
+    def _parse(self, body):
+        request = json.loads(body)
+        if not isinstance(request, dict):
+            raise ValueError("the request must be a JSON object")
+        if request.get('formulation') not in FORMULATIONS:
+            raise ValueError("formulation must be one of "+", ".join(FORMULATIONS))
+        edges = request.get('edges')
+        if not edges or any(len(e)!=2 for e in edges):
+            raise ValueError("edges must be a non-empty list of pairs")
+        v = max(max(e) for e in edges)
+        return {'formulation': request['formulation'], 'edges': edges,
+                'vertices': max(int(request.get('vertices', v)), v),
+                'time_limit': float(request.get('time_limit', 3600)),
+                'gap': float(request.get('gap', 0.05)),
+                'threads': int(request.get('threads', 1)),
+                'output': self.output}
+
+    def submit(self, body):
+        request = self._parse(body)
+        self.count += 1
+        job_id = str(self.count)
+        try:
+            future = self.executor.submit(_run_job, job_id, request, self.progress, self.cancelled)
+        except BrokenProcessPool:
+            #A worker died (killed, out of memory): the jobs it held have failed, start a new pool
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._executor()
+            future = self.executor.submit(_run_job, job_id, request, self.progress, self.cancelled)
+        job = {'id': job_id, 'status': 'queued', 'formulation': request['formulation'],
+               'submitted': time(), 'progress': None, 'result': None, 'error': None}
+        self.jobs[job_id] = (job, future)
+        asyncio.wrap_future(future).add_done_callback(lambda f: self._finished(job_id, f))
+        return job
+
+    def _finished(self, job_id, future):
+        job = self.jobs[job_id][0]
+        if future.cancelled():
+            job['status'] = 'cancelled'
+        elif future.exception() is not None:
+            job['status'] = 'failed'
+            job['error'] = str(future.exception())
+        else:
+            #A job cancelled while running keeps the incumbent it had
+            job['status'] = 'cancelled' if self.cancelled.get(job_id) else 'done'
+            job['result'] = future.result()
+        job['finished'] = time()
+
+    def cancel(self, job_id):
+        job, future = self.jobs[job_id]
+        if job['status'] in ('queued', 'running'):
+            self.cancelled[job_id] = True
+            if future.cancel():
+                job['status'] = 'cancelled'
+        return job
+
+    async def pump_progress(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                job_id, event, data = await loop.run_in_executor(None, self.progress.get, True, 1)
+            except queue.Empty:
+                continue
+            job = self.jobs[job_id][0]
+            if job['status'] not in ('queued', 'running'):
+                continue
+            if event == 'running':
+                job['status'] = 'running'
+                job['started'] = time()
+            else:
+                job['progress'] = data
+
+    def route(self, method, path, body):
+        parts = [p for p in path.split('/') if p]
+        if not parts or parts[0]!='jobs' or len(parts)>2:
+            return 404, {'error': 'not found'}
+        if len(parts)==1:
+            if method == 'GET':
+                return 200, [job for job, _ in self.jobs.values()]
+            if method == 'POST':
+                try:
+                    return 202, self.submit(body)
+                except (ValueError, TypeError, KeyError) as e:
+                    return 400, {'error': str(e)}
+            return 405, {'error': 'method not allowed'}
+        if parts[1] not in self.jobs:
+            return 404, {'error': 'unknown job'}
+        if method == 'GET':
+            return 200, self.jobs[parts[1]][0]
+        if method == 'DELETE':
+            return 200, self.cancel(parts[1])
+        return 405, {'error': 'method not allowed'}
+
+    async def handle(self, reader, writer):
+        try:
+            method, path, _ = (await reader.readline()).decode().split(' ', 2)
+            length = 0
+            while True:
+                line = (await reader.readline()).decode().strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            body = (await reader.readexactly(length)).decode() if length else ''
+            code, data = self.route(method, path, body)
+        except ValueError:
+            code, data = 400, {'error': 'bad request'}
+        except Exception as e:
+            code, data = 500, {'error': type(e).__name__+": "+str(e)}
+        payload = json.dumps(data).encode()
+        writer.write(("HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n"
+                      "Connection: close\r\n\r\n" % (code, STATUS[code], len(payload))).encode()+payload)
+        await writer.drain()
+        writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        asyncio.create_task(self.pump_progress())
+        print("Listening on http://%s:%d" % (host, port))
+        async with server:
+            await server.serve_forever()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.manager.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local connected dominating set solve service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--output', default="results")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    service = SolveService(args.workers, args.output)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# # Multiple optimal or near-optimal connected dominating sets
+#
+# The k best distinct vertex sets (or all sets within `gap` vertices of the
+# optimum) of a built formulation, from a single model. CPLEX's solution pool
+# seeds the search, then no-good cuts on x exclude every set already found and
+# the model is solved again, warm started with a found set extended by one
+# neighbour. A set is certified as soon as the best remaining set is not
+# better, so the result is exact whenever the solves are. Sets are compared
+# on their vertices only and are returned with a spanning tree of their
+# connecting edges.
+from docplex.mp.utils import DOcplexException
+from graphs import neighbourhood, spanning_edges
+
+
+def _vertex_set(instance, solution):
+    return frozenset(i for i in instance.V if solution.get_value(instance.x[i])>0.9)
+
+
+def _no_good(instance, vertices):
+    model = instance.model
+    model.add_constraint(model.sum(1-instance.x[i] for i in vertices)+
+                         model.sum(instance.x[i] for i in instance.V if i not in vertices)>=1)
+
+
+def _warm_start(instance, found, nbrs):
+    #The best set plus one of its neighbours is still a connected dominating set.
+    #docplex keeps every start it was given, only the last one is useful
+    instance.model.clear_mip_starts()
+    best = min(found, key=found.get)
+    for v in sorted(set().union(*(nbrs[i] for i in best))-best):
+        if best|{v} not in found:
+            start = instance.model.new_solution()
+            for i in instance.V:
+                start.add_var_value(instance.x[i], 1 if i in best or i==v else 0)
+            instance.model.add_mip_start(start)
+            return
+
+
+def _populate(instance, k, gap, found):
+    model = instance.model
+    model.parameters.mip.pool.intensity = 4
+    if gap is not None:
+        model.parameters.mip.pool.absgap = gap
+    if k is not None:
+        model.parameters.mip.limits.populate = 10*k
+    try:
+        pool = model.populate_solution_pool()
+    except (AttributeError, TypeError, DOcplexException):
+        return
+    for solution in pool or []:
+        found.setdefault(_vertex_set(instance, solution), round(solution.objective_value))
+
+
+# Returns (objective, vertices, edges) sorted by objective. The cuts stay in the
+# model of the instance, which should not be solved again afterwards.
+def solution_pool(instance, k=10, gap=None):
+    if k is None and gap is None:
+        raise ValueError("k or gap is needed to bound the enumeration")
+    instance._set_parameters()
+    instance.model.parameters.mip.tolerances.mipgap = 0
+    nbrs = neighbourhood(instance.V, instance.E)
+    found = {}
+    _populate(instance, k, gap, found)
+    cut = set()
+    certified = []
+    while True:
+        for vertices in found:
+            if vertices not in cut:
+                _no_good(instance, vertices)
+                cut.add(vertices)
+        if found:
+            _warm_start(instance, found, nbrs)
+        solution = instance.model.solve(log_output=instance.status)
+        remaining = round(solution.objective_value) if solution is not None else None
+        certified = sorted((objective, sorted(vertices)) for vertices, objective in found.items()
+                           if remaining is None or objective<=remaining)
+        best = certified[0][0] if certified else remaining
+        if gap is not None:
+            certified = [c for c in certified if c[0]<=best+gap]
+        if remaining is None or (k is not None and len(certified)>=k) \
+                or (gap is not None and best is not None and remaining>best+gap):
+            break
+        found[_vertex_set(instance, solution)] = remaining
+    if k is not None:
+        certified = certified[:k]
+    return [(objective, vertices, spanning_edges(set(vertices), nbrs)) for objective, vertices in certified]
@@ -0,0 +1,35 @@
+# # Model templates reused across graphs with the same number of vertices
+#
+# The variables, the objective and the rows that do not depend on the edges
+# (u bounds and root rows of MTZ, 3e/3f of Martin, ...) are built once per
+# (formulation, n). For every new graph only the edge-dependent rows are
+# removed and added again. The edge variables of a template exist for every
+# ordered pair, the pairs that are not edges are fixed to 0 with bounds (rows
+# in Martin's own model). SCF has no template: all of its rows but two depend on the edges,
+# so patching it is slower than building it again.
+from formulations import create_model
+
+TEMPLATES = ('MTZ', 'MTZ_tight', 'Martin', 'Martin_opti')
+
+
+class Template:
+    def __init__(self, name, status=False, **options):
+        if name not in TEMPLATES:
+            raise ValueError("No template for '"+name+"', available: "+", ".join(TEMPLATES))
+        self.name = name
+        self.status = status
+        self.options = options
+        self.models = {}
+
+    def instance(self, V,E,A):
+        n = len(V)
+        if n not in self.models:
+            instance = create_model(self.name, V,E,A, self.status, template=True, **self.options)
+            instance._build_model()
+            self.models[n] = instance
+        else:
+            self.models[n]._patch(E, A)
+        return self.models[n]
+
+    def solve(self, V,E,A):
+        return self.instance(V,E,A).solve_model()
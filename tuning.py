@@ -0,0 +1,236 @@
+# # Solver parameter tuning per instance class
+#
+# Instances are grouped in classes (formulation, size, density) with the size
+# and density rounded up to the buckets below. For a class, a training set of
+# instances is solved with the default settings and with random parameter
+# sets, and the set with the lowest total time wins (PAR2: an instance that is
+# not solved within the time limit counts twice the limit). Every time is the
+# median of a few solves, a candidate is dropped as soon as its total is worse
+# than the best one or a solve fails, and the winner is kept only if it beats
+# the defaults by a relative margin (10% by default). For formulations
+# without callbacks the CPLEX tuning tool can be used instead (--method cplex).
+# The winners are stored in tuning/parameters.json and every _set_parameters
+# applies the set of its class, if there is one:
+#
+# python3 tuning.py -f SSL_lazy --vertices 50 --degree 4 --instances 5 --trials 20 --time-limit 60
+from time import time
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+from formulations import FORMULATIONS, create_model, formulation_name
+
+CACHE = "tuning/parameters.json"
+SIZES = [15, 30, 60, 100, 200, 500, 1000, 2000, 5000]
+DENSITIES = [1, 2, 5, 10, 20, 50, 100]
+#Formulations whose model is complete without callbacks or an outer loop
+CPLEX_TUNABLE = ['MTZ', 'MTZ_tight', 'SCF', 'SCF_tight', 'Martin', 'Martin_opti']
+
+SPACE = {
+    'emphasis.mip': [0, 1, 2, 3, 4],
+    'mip.strategy.heuristicfreq': [-1, 0, 5, 10, 20],
+    'mip.strategy.probe': [-1, 0, 1, 2, 3],
+    'mip.strategy.variableselect': [-1, 0, 1, 2, 3, 4],
+    'mip.cuts.mircut': [-1, 0, 1, 2],
+    'mip.cuts.gomory': [-1, 0, 1, 2],
+    'mip.cuts.flowcovers': [-1, 0, 1, 2],
+    'mip.cuts.implied': [-1, 0, 1, 2],
+    'threads': [0, 1, 2, 4],
+}
+
+_caches = {}
+
+
+def _bucket(value, buckets):
+    for b in buckets:
+        if value<=b:
+            return b
+    return value
+
+
+def instance_class(name, V,E):
+    density = int(len(E)*2/(len(V)*len(V)-1)*100)
+    return name+"|"+str(_bucket(len(V), SIZES))+"|"+str(_bucket(density, DENSITIES))
+
+
+def load_cache(filename=CACHE):
+    if not os.path.exists(filename):
+        return {}
+    mtime = os.path.getmtime(filename)
+    if filename not in _caches or _caches[filename][0]!=mtime:
+        with open(filename) as f:
+            _caches[filename] = (mtime, json.load(f))
+    return _caches[filename][1]
+
+
+def save_cache(cache, filename=CACHE):
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    tmp = filename+'.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(tmp, filename)
+
+
+def _set_parameter(model, name, value):
+    parameter = model.parameters
+    for part in name.split('.'):
+        parameter = getattr(parameter, part)
+    parameter.set(value)
+
+
+def apply_tuned_parameters(instance):
+    #Called from _set_parameters. instance.tuned, set by the tuning itself,
+    #takes precedence over the cache; an explicit thread count is kept
+    tuned = getattr(instance, 'tuned', None)
+    if tuned is None:
+        entry = load_cache().get(instance_class(formulation_name(instance), instance.V, instance.E))
+        tuned = entry['parameters'] if entry else {}
+    for parameter, value in tuned.items():
+        if parameter == 'threads' and instance.threads:
+            continue
+        _set_parameter(instance.model, parameter, value)
+
+
+def _run(name, graph, parameters, timelimit, options, output):
+    V,E,A = graph
+    instance = create_model(name, V,E,A, False, timelimit=timelimit, output=output, **options)
+    instance.tuned = parameters
+    instance._build_model()
+    start = time()
+    try:
+        instance.solve_model()
+    except Exception as e:
+        #Bad parameter values, solver limits, ...: a failed trial, not a slow one
+        print("Trial failed", parameters, type(e).__name__+":", e, file=sys.stderr)
+        return None
+    elapsed = time()-start
+    if elapsed>=timelimit or instance.model.solve_details.has_hit_limit():
+        return 2*timelimit
+    return elapsed
+
+
+def _median_run(name, graph, parameters, timelimit, options, output, repeats):
+    times = []
+    for _ in range(repeats):
+        elapsed = _run(name, graph, parameters, timelimit, options, output)
+        if elapsed is None:
+            return None
+        times.append(elapsed)
+    return sorted(times)[len(times)//2]
+
+
+def random_search(name, graphs, trials=20, timelimit=60, seed=0, repeats=3, margin=0.1, **options):
+    rnd = random.Random(seed)
+    output = tempfile.mkdtemp(prefix="tuning")
+    candidates = [{}]
+    for _ in range(trials):
+        keys = rnd.sample(sorted(SPACE), rnd.randint(1, 3))
+        candidates.append({key: rnd.choice(SPACE[key]) for key in keys})
+    best, best_score, default_score = None, None, None
+    for parameters in candidates:
+        score = 0
+        for graph in graphs:
+            elapsed = _median_run(name, graph, parameters, timelimit, options, output, repeats)
+            if elapsed is None:
+                score = None
+                break
+            score += elapsed
+            if best_score is not None and score>=best_score:
+                break
+        print(parameters, score, file=sys.stderr)
+        if score is None:
+            continue
+        if not parameters:
+            default_score = score
+        if best_score is None or score<best_score:
+            best, best_score = parameters, score
+    if default_score is None or best_score>(1-margin)*default_score:
+        #Within the noise of the defaults (or nothing to compare with): keep them
+        return {}, default_score, default_score
+    return best, best_score, default_score
+
+
+def cplex_tuning(name, graphs, timelimit=60, **options):
+    if name not in CPLEX_TUNABLE:
+        raise ValueError("The CPLEX tuning tool needs a complete model, use the random search for "+name)
+    directory = tempfile.mkdtemp(prefix="tuning")
+    files = []
+    for n, (V,E,A) in enumerate(graphs):
+        instance = create_model(name, V,E,A, False, **options)
+        instance._build_model()
+        instance.model.export_as_sav(os.path.join(directory, str(n)+".sav"))
+        files.append(os.path.join(directory, str(n)+".sav"))
+    cpx = instance.model.get_cplex()
+    cpx.parameters.tune.timelimit.set(timelimit*len(graphs)*len(SPACE))
+    cpx.parameters.tune.measure.set(cpx.parameters.tune.measure.values.average)
+    cpx.parameters.tune_problem_set(files, fixed_parameters_and_values=[(cpx.parameters.timelimit, timelimit),
+                                    (cpx.parameters.mip.tolerances.mipgap, options.get('mipgap', 0.05))])
+    best = {}
+    for parameter, value in cpx.parameters.get_changed():
+        key = repr(parameter).split('parameters.', 1)[-1]
+        if key not in ('timelimit', 'mip.tolerances.mipgap') and not key.startswith('tune.'):
+            best[key] = value
+    return best, None, None
+
+
+def tune(name, graphs, method='random', trials=20, timelimit=60, seed=0, cache=CACHE, repeats=3, margin=0.1,
+         **options):
+    classes = {}
+    for V,E,A in graphs:
+        classes.setdefault(instance_class(name, V,E), []).append((V,E,A))
+    stored = dict(load_cache(cache))
+    for key, members in sorted(classes.items()):
+        print("Tuning", key, "on", len(members), "instances", file=sys.stderr)
+        if method == 'cplex':
+            parameters, score, default_score = cplex_tuning(name, members, timelimit, **options)
+        else:
+            parameters, score, default_score = random_search(name, members, trials, timelimit, seed, repeats,
+                                                             margin, **options)
+        stored[key] = {'parameters': parameters, 'score': score, 'default_score': default_score,
+                       'instances': len(members), 'method': method}
+    save_cache(stored, cache)
+    return stored
+
+
+def main(argv=None):
+    from Tests import adjacency_matrix, random_graph, read_graph
+    parser = argparse.ArgumentParser(description="Tune the CPLEX parameters of a formulation per instance class")
+    parser.add_argument('-f', '--formulation', required=True, choices=list(FORMULATIONS))
+    parser.add_argument('--vertices', type=int, help="number of vertices of the random training graphs")
+    parser.add_argument('--degree', type=float, help="average degree of the random training graphs")
+    parser.add_argument('--instances', type=int, default=5, help="number of random training graphs")
+    parser.add_argument('--edge-file', action='append', default=[], help="training graph, can be repeated")
+    parser.add_argument('--method', choices=['random', 'cplex'], default='random')
+    parser.add_argument('--trials', type=int, default=20, help="random parameter sets to try")
+    parser.add_argument('--time-limit', type=float, default=60, help="per training solve")
+    parser.add_argument('--repeats', type=int, default=3, help="solves per instance, the median time counts")
+    parser.add_argument('--margin', type=float, default=0.1,
+                        help="relative improvement over the defaults needed to keep a parameter set")
+    parser.add_argument('--gap', type=float, default=0.05, help="relative MIP gap")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cache', default=CACHE)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    graphs = []
+    if args.vertices is not None:
+        if args.degree is None:
+            parser.error("--degree is needed with --vertices")
+        e = int(args.degree*args.vertices/2)
+        for seed in range(args.seed, args.seed+args.instances):
+            E = random_graph(args.vertices, e, seed)
+            graphs.append(([i for i in range(1,args.vertices+1)], E, adjacency_matrix(args.vertices, E)))
+    for filename in args.edge_file:
+        v, E = read_graph(filename)
+        graphs.append(([i for i in range(1,v+1)], E, adjacency_matrix(v, E)))
+    if not graphs:
+        parser.error("no training graphs, use --vertices/--degree or --edge-file")
+    stored = tune(args.formulation, graphs, args.method, args.trials, args.time_limit, args.seed,
+                  args.cache, args.repeats, args.margin, mipgap=args.gap)
+    for key, entry in sorted(stored.items()):
+        if key.startswith(args.formulation+"|"):
+            print(key, entry['parameters'], entry['score'], entry['default_score'])
+
+
+if __name__ == "__main__":
+    main()